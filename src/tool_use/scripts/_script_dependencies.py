@@ -19,6 +19,7 @@ SCRIPT_DEPENDENCIES = {
         "ollama",
         "pydantic",
         "openai>=1.12.0",
+        "numpy",
     ],
     "prioritize": [
         "pyaudio",
@@ -28,8 +29,9 @@ SCRIPT_DEPENDENCIES = {
         "ollama",
         "pydantic",
         "openai>=1.12.0",
+        "numpy",
     ],
-    "log": [],
+    "log": ["numpy"],
     "marketing-plan": ["rich", "openai", "swarm"],
     "posture": [
         "moondream",
@@ -2,10 +2,20 @@ from pathlib import Path
 import sqlite3
 import time
 import datetime
-from typing import Optional, Tuple, List
+import itertools
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import sys
+from typing import Callable, Dict, Iterator, Optional, Tuple, List
 from rich.console import Console
+from rich.markup import escape
 from rich.table import Table
+from rich.text import Text
 from ..utils.ai_service import AIService
+from ..utils import activity_io, activity_sync, idle_monitor, window_watcher
 
 HELP_TEXT = """Usage: ai log [command] [args]
 
@@ -13,14 +23,39 @@ Commands:
   <activity>           Start tracking an activity
   (no arguments)       Stop current activity or prompt to start one
   tell <query>         Query your activity history in natural language
+                       [--limit N] [--offset N] [--format rich|plain|json]
   category <command>   Manage activity categories
+  search "<terms>"     Find past activities by keyword, best matches first
+                       (quote several words, or pass an option)
+  report               Show a weekly-review report (no AI needed)
+                       [--since <date>] [--until <date>]
+  export <file>        Export your activity history (CSV, JSONL or Parquet)
+  import <file>        Import activities from a CSV, JSONL or Parquet file
+  sync [<folder>]      Exchange activity changes with your other devices
+                       through a shared folder (defaults to the last one used)
+  idle [status]        Watch for time away from the keyboard, which is then
+                       left out of activity durations
+                       [--threshold <minutes>] [--probe auto|xprintidle|gnome|macos|file:<path>]
+  watch [summary]      Track the focused window in the background and
+                       categorize what you work on automatically
+                       [--interval <seconds>] [--probe auto|x11|macos|file:<path>]
+                       summary: [--since <date>]
   help                Show this help message
 
 Examples:
   ai log working on python project
   ai log tell me how long I coded today
   ai log tell me what I did yesterday
+  ai log tell what did I do this week --format json
   ai log category list
+  ai log search "migration project"
+  ai log report --since 30d
+  ai log export activities.csv --since 2024-01-01
+  ai log import other_tracker.jsonl
+  ai log sync ~/Dropbox/ai-log
+
+A command word only runs its command when what follows fits it, so
+`ai log watch a movie` or `ai log sync calendars` start activities.
 
 For more details on a command, use: ai log <command> help
 """
@@ -32,6 +67,9 @@ Commands:
   rename <old> <new> Rename a category
   merge <from> <into> Merge one category into another
   show <name>       List activities in a category
+                    [--limit N] [--offset N] [--format rich|plain|json]
+  recategorize [--since <date>]
+                    Re-run AI categorization over past activities
   help              Show this help message
 
 Examples:
@@ -39,32 +77,730 @@ Examples:
   ai log category rename "<old name>" "<new name>"
   ai log category merge "<source name>" "<target name>"
   ai log category show "<category name>"
+  ai log category recategorize --since 2024-11-01
+  ai log category recategorize --since 30d
 """
 
+# Bulk recategorization settings
+RECATEGORIZE_BATCH_SIZE = 40
+RECATEGORIZE_MAX_WORKERS = 4
+RECATEGORIZE_MIN_INTERVAL = 0.5  # seconds between LLM requests
+
+
+class _RateLimiter:
+    """Space out calls across threads so at most one starts per interval"""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def parse_since(value: str) -> datetime.datetime:
+    """Parse a --since value: YYYY-MM-DD, today, yesterday, or <N>d / <N>w"""
+    value = value.strip().lower()
+    today = datetime.datetime.combine(datetime.date.today(), datetime.time())
+    if value == "today":
+        return today
+    if value == "yesterday":
+        return today - datetime.timedelta(days=1)
+    match = re.fullmatch(r"(\d+)([dw])", value)
+    if match:
+        amount = int(match.group(1))
+        days = amount * 7 if match.group(2) == "w" else amount
+        return today - datetime.timedelta(days=days)
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(
+            f"Invalid date '{value}'. Use YYYY-MM-DD, today, yesterday, 7d or 2w"
+        )
+
+
+def split_options(
+    args: List[str], options: List[str]
+) -> Tuple[List[str], Dict[str, str]]:
+    """Separate `--name value` options from positional arguments"""
+    positional, values = [], {}
+    remaining = iter(args)
+    for arg in remaining:
+        if arg.startswith("--"):
+            name = arg[2:]
+            if name not in options:
+                raise ValueError(f"Unknown option '{arg}'")
+            value = next(remaining, None)
+            if value is None:
+                raise ValueError(f"Option '{arg}' needs a value")
+            values[name] = value
+        else:
+            positional.append(arg)
+    return positional, values
+
+
+def is_command(args: List[str], accepts: Callable[[List[str]], bool]) -> bool:
+    """Whether `ai log <word> ...` is the subcommand <word> rather than an
+    activity whose name starts with it: it is if any --option is given, else
+    only if `accepts` takes the remaining arguments"""
+    rest = args[1:]
+    return any(arg.startswith("--") for arg in rest) or accepts(rest)
+
+
+def _is_file_argument(positional: List[str]) -> bool:
+    if len(positional) != 1:
+        return False
+    try:
+        activity_io.detect_format(positional[0])
+    except ValueError:
+        return False
+    return True
+
+
+def _is_folder_argument(positional: List[str]) -> bool:
+    if not positional:
+        return True
+    if len(positional) != 1:
+        return False
+    folder = positional[0]
+    return folder.startswith(("~", ".")) or os.sep in folder or Path(folder).is_dir()
+
+
+def extract_json_object(text: str) -> dict:
+    """Pull the first JSON object out of an LLM response"""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        raise ValueError("No JSON object found in response")
+    return json.loads(text[start : end + 1])
+
+
+# Translation cache for natural language queries
+QUERY_CACHE_SIZE = 500
+LITERAL_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+# Finished activities roll up into per day x category totals. Triggers add a
+# row's contribution when it gains a duration and subtract it when it changes.
+ROLLUP_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS daily_category_totals (
+        day TEXT NOT NULL,
+        category TEXT NOT NULL,
+        total_duration REAL NOT NULL DEFAULT 0,
+        activity_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, category)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS rollup_after_insert
+    AFTER INSERT ON activities
+    WHEN NEW.duration IS NOT NULL
+    BEGIN
+        INSERT INTO daily_category_totals (day, category, total_duration, activity_count)
+        VALUES (date(NEW.start_time), COALESCE(NEW.category, 'Uncategorized'), NEW.duration, 1)
+        ON CONFLICT(day, category) DO UPDATE SET
+            total_duration = total_duration + excluded.total_duration,
+            activity_count = activity_count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS rollup_after_update_old
+    AFTER UPDATE OF start_time, duration, category ON activities
+    WHEN OLD.duration IS NOT NULL
+    BEGIN
+        UPDATE daily_category_totals
+        SET total_duration = total_duration - OLD.duration,
+            activity_count = activity_count - 1
+        WHERE day = date(OLD.start_time)
+            AND category = COALESCE(OLD.category, 'Uncategorized');
+        DELETE FROM daily_category_totals
+        WHERE day = date(OLD.start_time)
+            AND category = COALESCE(OLD.category, 'Uncategorized')
+            AND activity_count <= 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS rollup_after_update_new
+    AFTER UPDATE OF start_time, duration, category ON activities
+    WHEN NEW.duration IS NOT NULL
+    BEGIN
+        INSERT INTO daily_category_totals (day, category, total_duration, activity_count)
+        VALUES (date(NEW.start_time), COALESCE(NEW.category, 'Uncategorized'), NEW.duration, 1)
+        ON CONFLICT(day, category) DO UPDATE SET
+            total_duration = total_duration + excluded.total_duration,
+            activity_count = activity_count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS rollup_after_delete
+    AFTER DELETE ON activities
+    WHEN OLD.duration IS NOT NULL
+    BEGIN
+        UPDATE daily_category_totals
+        SET total_duration = total_duration - OLD.duration,
+            activity_count = activity_count - 1
+        WHERE day = date(OLD.start_time)
+            AND category = COALESCE(OLD.category, 'Uncategorized');
+        DELETE FROM daily_category_totals
+        WHERE day = date(OLD.start_time)
+            AND category = COALESCE(OLD.category, 'Uncategorized')
+            AND activity_count <= 0;
+    END
+    """,
+]
+
+# Per category activity counters, kept consistent by triggers on activities so
+# listing categories never has to aggregate the activities table
+CATEGORY_COUNTER_SCHEMA = [
+    "CREATE INDEX IF NOT EXISTS idx_categories_count ON categories(count DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_activities_category ON activities(category, start_time)",
+    """
+    CREATE TRIGGER IF NOT EXISTS category_counts_after_insert
+    AFTER INSERT ON activities
+    WHEN NEW.category IS NOT NULL
+    BEGIN
+        INSERT INTO categories (name, count) VALUES (NEW.category, 0)
+        ON CONFLICT(name) DO NOTHING;
+        UPDATE categories
+        SET activity_count = activity_count + 1,
+            total_duration = total_duration + COALESCE(NEW.duration, 0)
+        WHERE name = NEW.category;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS category_counts_after_update
+    AFTER UPDATE OF category, duration ON activities
+    BEGIN
+        UPDATE categories
+        SET activity_count = activity_count - 1,
+            total_duration = total_duration - COALESCE(OLD.duration, 0)
+        WHERE name = OLD.category;
+        INSERT INTO categories (name, count)
+        SELECT NEW.category, 0 WHERE NEW.category IS NOT NULL
+        ON CONFLICT(name) DO NOTHING;
+        UPDATE categories
+        SET activity_count = activity_count + 1,
+            total_duration = total_duration + COALESCE(NEW.duration, 0)
+        WHERE name = NEW.category;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS category_counts_after_delete
+    AFTER DELETE ON activities
+    WHEN OLD.category IS NOT NULL
+    BEGIN
+        UPDATE categories
+        SET activity_count = activity_count - 1,
+            total_duration = total_duration - COALESCE(OLD.duration, 0)
+        WHERE name = OLD.category;
+    END
+    """,
+]
+
+# Full-text index over activity names and categories. It's an external
+# content table, so the triggers only keep the index itself in sync.
+FTS_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS activities_fts USING fts5(
+        name, category,
+        content='activities', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS activities_fts_after_insert
+    AFTER INSERT ON activities
+    BEGIN
+        INSERT INTO activities_fts (rowid, name, category)
+        VALUES (NEW.id, NEW.name, NEW.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS activities_fts_after_delete
+    AFTER DELETE ON activities
+    BEGIN
+        INSERT INTO activities_fts (activities_fts, rowid, name, category)
+        VALUES ('delete', OLD.id, OLD.name, OLD.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS activities_fts_after_update
+    AFTER UPDATE OF name, category ON activities
+    BEGIN
+        INSERT INTO activities_fts (activities_fts, rowid, name, category)
+        VALUES ('delete', OLD.id, OLD.name, OLD.category);
+        INSERT INTO activities_fts (rowid, name, category)
+        VALUES (NEW.id, NEW.name, NEW.category);
+    END
+    """,
+]
+
+# Time away from the keyboard, recorded by `ai log idle`. An interval with
+# no end_time is still in progress; last_seen is the monitor's latest
+# heartbeat, so an interval left open by a killed monitor ends there.
+IDLE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS idle_intervals (
+        start_time TIMESTAMP PRIMARY KEY,
+        end_time TIMESTAMP,
+        last_seen TIMESTAMP
+    ) WITHOUT ROWID
+    """,
+]
+
+# Embeddings of distinct activity names and categories for semantic queries.
+# The triggers queue new text; vectors are computed on the next refresh.
+# A model whose refresh failed is remembered, so it isn't retried (and
+# warned about) on every query.
+EMBEDDING_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS embeddings (
+        kind TEXT NOT NULL,
+        text TEXT NOT NULL,
+        model TEXT NOT NULL,
+        vector BLOB NOT NULL,
+        PRIMARY KEY (kind, text)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS embedding_queue (
+        kind TEXT NOT NULL,
+        text TEXT NOT NULL,
+        PRIMARY KEY (kind, text)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS embedding_failures (
+        model TEXT PRIMARY KEY,
+        failed_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS embedding_queue_after_activity_insert
+    AFTER INSERT ON activities
+    WHEN NOT EXISTS (SELECT 1 FROM embeddings WHERE kind = 'name' AND text = NEW.name)
+    BEGIN
+        INSERT OR IGNORE INTO embedding_queue (kind, text) VALUES ('name', NEW.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS embedding_queue_after_activity_rename
+    AFTER UPDATE OF name ON activities
+    WHEN NOT EXISTS (SELECT 1 FROM embeddings WHERE kind = 'name' AND text = NEW.name)
+    BEGIN
+        INSERT OR IGNORE INTO embedding_queue (kind, text) VALUES ('name', NEW.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS embedding_queue_after_category_insert
+    AFTER INSERT ON categories
+    WHEN NOT EXISTS (SELECT 1 FROM embeddings WHERE kind = 'category' AND text = NEW.name)
+    BEGIN
+        INSERT OR IGNORE INTO embedding_queue (kind, text) VALUES ('category', NEW.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS embedding_queue_after_category_rename
+    AFTER UPDATE OF name ON categories
+    WHEN NOT EXISTS (SELECT 1 FROM embeddings WHERE kind = 'category' AND text = NEW.name)
+    BEGIN
+        INSERT OR IGNORE INTO embedding_queue (kind, text) VALUES ('category', NEW.name);
+    END
+    """,
+]
+
+# Embedding indexes by (database, embedding model), shared by every manager
+# in the process so the vectors are loaded once. False marks an index whose
+# refresh failed; it isn't retried (or warned about again) in this process.
+_embedding_indexes: Dict[Tuple[Path, str], object] = {}
+
+# Result columns holding seconds, rendered as durations
+DURATION_COLUMNS = {
+    "duration",
+    "total_duration",
+    "today",
+    "yesterday",
+    "this_week",
+    "last_week",
+}
+
+EXAMPLE_TEMPLATES = {
+    "today": """
+        -- Shows activities from today
+        SELECT name, start_time, duration, category
+        FROM activities 
+        WHERE date(start_time) = date('now', 'localtime')
+        ORDER BY start_time DESC
+    """,
+    "yesterday": """
+        -- Shows activities from yesterday
+        SELECT name, start_time, duration, category
+        FROM activities 
+        WHERE date(start_time) = date('now', '-1 day', 'localtime')
+        ORDER BY start_time DESC
+    """,
+    "time_summary": """
+        -- Shows total time by category for a period
+        SELECT category, SUM(total_duration) as total_duration, SUM(activity_count) as activity_count
+        FROM daily_category_totals
+        WHERE day = date('now', '-1 day', 'localtime')
+        GROUP BY category
+        ORDER BY total_duration DESC
+    """,
+    "longest_activities": """
+        -- Shows activities ordered by duration
+        SELECT name, start_time, duration, category
+        FROM activities
+        WHERE date(start_time) = date('now', '-1 day', 'localtime')
+        ORDER BY duration DESC
+    """,
+    "comparison": """
+        -- Compares two time periods
+        SELECT category,
+            SUM(CASE WHEN day = date('now', 'localtime') THEN total_duration ELSE 0 END) as today,
+            SUM(CASE WHEN day = date('now', '-1 day', 'localtime') THEN total_duration ELSE 0 END) as yesterday
+        FROM daily_category_totals
+        WHERE day >= date('now', '-1 day', 'localtime')
+        GROUP BY category
+    """,
+    "week_over_week": """
+        -- Compares time by category this week (last 7 days) with the week before
+        SELECT category,
+            SUM(CASE WHEN day >= date('now', '-6 days', 'localtime') THEN total_duration ELSE 0 END) as this_week,
+            SUM(CASE WHEN day < date('now', '-6 days', 'localtime') THEN total_duration ELSE 0 END) as last_week
+        FROM daily_category_totals
+        WHERE day >= date('now', '-13 days', 'localtime')
+        GROUP BY category
+        ORDER BY this_week DESC
+    """,
+    "activity_list": """
+        -- Lists activities with times
+        SELECT name, start_time, duration, category
+        FROM activities
+        WHERE date(start_time) >= date('now', '-7 days', 'localtime')
+        ORDER BY start_time DESC
+    """,
+}
+
+# Sandbox limits for generated SQL
+QUERY_ROW_LIMIT = 5000
+QUERY_TIME_BUDGET = 5.0  # seconds per fetch
+QUERY_FETCH_SIZE = 200
+QUERY_PROGRESS_STEPS = 10000  # VM instructions between deadline checks
+SEMANTIC_TOPIC_RE = re.compile(
+    r"semantic_match\s*\(\s*\w+\s*,\s*'((?:[^']|'')*)'\s*\)", re.IGNORECASE
+)
+
+_READONLY_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    sqlite3.SQLITE_RECURSIVE,
+}
+
+
+class QueryError(Exception):
+    """Raised when a generated query can't be run safely"""
+
+
+def _readonly_authorizer(action, arg1, arg2, db_name, trigger) -> int:
+    """sqlite3 authorizer that denies anything but reading"""
+    if action in _READONLY_ACTIONS:
+        return sqlite3.SQLITE_OK
+    # Opening the FTS5 index declares its schema (reported as an update of
+    # sqlite_master, which SQLite never lets a query modify) and checks the
+    # data version
+    if action == sqlite3.SQLITE_UPDATE and arg1 == "sqlite_master":
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_PRAGMA and arg1 == "data_version" and arg2 is None:
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+def clean_sql(response: str) -> str:
+    """Strip markdown fences and trailing semicolons from an LLM SQL response"""
+    sql_query = response.strip()
+    fence = re.match(r"^```(?:sql)?\s*(.*?)\s*```$", sql_query, re.DOTALL | re.IGNORECASE)
+    if fence:
+        sql_query = fence.group(1)
+    return sql_query.strip().rstrip(";").strip()
+
+
+# Words that may appear in a query without changing which template answers it
+_INTENT_FILLER = {
+    "a", "activities", "activity", "all", "am", "and", "did", "do", "doing",
+    "done", "during", "for", "have", "how", "i", "in", "is", "list", "me",
+    "my", "of", "on", "over", "show", "spend", "spent", "tell", "the", "to",
+    "was", "what", "whats", "where", "which", "work", "worked", "working",
+}
+
+# (template key, groups of which at least one word each must appear, extra allowed words)
+INTENT_RULES = [
+    (
+        "comparison",
+        [{"compare", "comparison", "versus", "vs"}, {"today"}, {"yesterday"}],
+        {"with", "between"},
+    ),
+    (
+        "week_over_week",
+        [{"compare", "comparison", "versus", "vs"}, {"week"}],
+        {"this", "last", "previous", "with", "between", "weeks"},
+    ),
+    (
+        "time_summary",
+        [{"yesterday"}, {"long", "much", "time", "summary", "total", "category", "categories"}],
+        {"by", "per", "each", "spend", "spent"},
+    ),
+    (
+        "longest_activities",
+        [{"yesterday"}, {"longest", "most"}],
+        {"took", "time", "longer", "long"},
+    ),
+    ("today", [{"today"}], set()),
+    ("yesterday", [{"yesterday"}], set()),
+    (
+        "activity_list",
+        [{"week", "7", "seven"}],
+        {"this", "past", "last", "days"},
+    ),
+]
+
+
+def normalize_query(query: str) -> str:
+    """Normalize query text for cache lookups and intent matching"""
+    words = re.sub(r"[^a-z0-9\s]", " ", query.lower()).split()
+    # "ai log tell me ..." leaves a leading "me" on every query
+    while words and words[0] in ("me", "tell"):
+        words = words[1:]
+    return " ".join(words)
+
+
+def match_intent(normalized_query: str) -> Optional[str]:
+    """Map a normalized query onto an example template key, if it clearly fits one"""
+    words = set(normalized_query.split())
+    if not words:
+        return None
+    for key, required_groups, extra_words in INTENT_RULES:
+        if not all(words & group for group in required_groups):
+            continue
+        allowed = _INTENT_FILLER | extra_words | set().union(*required_groups)
+        if words <= allowed:
+            return key
+    return None
+
+
+# Result rendering
+PAGE_SIZE = 50
+OUTPUT_FORMATS = ("rich", "plain", "json")
+
+# (title, [(column header, Table.add_column kwargs)], row -> cell strings)
+ResultView = Tuple[str, List[Tuple[str, dict]], Callable[[dict], List[str]]]
+
+
+def _format_duration_cell(value) -> str:
+    if value:
+        return ActivityManager.format_duration(value)
+    return "[yellow]In progress[/yellow]"
+
+
+def result_view(first: dict) -> ResultView:
+    """Pick the table layout for a `tell` result from the shape of its first row"""
+    if "total_duration" in first:
+        # Summary table for aggregated results
+        return (
+            "Activity Summary",
+            [("Category", {"style": "cyan"}), ("Duration", {"justify": "right"})],
+            lambda row: [
+                escape(row.get("category") or "Uncategorized"),
+                ActivityManager.format_duration(row["total_duration"] or 0),
+            ],
+        )
+
+    if "start_time" not in first:
+        # Other aggregates, e.g. comparisons between periods
+        keys = list(first)
+        return (
+            "Activity Summary",
+            [
+                (
+                    key.replace("_", " ").title(),
+                    {"style": "cyan"} if key == "category" else {"justify": "right"},
+                )
+                for key in keys
+            ],
+            lambda row: [
+                ActivityManager.format_duration(row.get(key) or 0)
+                if key in DURATION_COLUMNS
+                else escape(str(row[key] if row.get(key) is not None else "Uncategorized"))
+                for key in keys
+            ],
+        )
+
+    # Detailed activity list table
+    return (
+        "Activities",
+        [
+            ("Time", {"style": "cyan"}),
+            ("Activity", {}),
+            ("Duration", {"justify": "right"}),
+            ("Category", {"style": "blue"}),
+        ],
+        lambda row: [
+            datetime.datetime.fromisoformat(str(row["start_time"])).strftime("%H:%M"),
+            escape(row["name"]),
+            _format_duration_cell(row.get("duration")),
+            escape(row.get("category") or "Uncategorized"),
+        ],
+    )
+
+
+def category_view(category: str) -> ResultView:
+    """Table layout for `category show`"""
+    return (
+        f"Activities in {escape(category)}",
+        [
+            ("Date", {"style": "cyan"}),
+            ("Activity", {}),
+            ("Duration", {"justify": "right"}),
+        ],
+        lambda row: [
+            datetime.datetime.fromisoformat(str(row["start_time"])).strftime(
+                "%Y-%m-%d %H:%M"
+            ),
+            escape(row["name"]),
+            _format_duration_cell(row.get("duration")),
+        ],
+    )
+
+
+def search_view(terms: str) -> ResultView:
+    """Table layout for `search`"""
+    return (
+        f"Activities matching '{escape(terms)}'",
+        [
+            ("Date", {"style": "cyan"}),
+            ("Activity", {}),
+            ("Duration", {"justify": "right"}),
+            ("Category", {"style": "blue"}),
+        ],
+        lambda row: [
+            datetime.datetime.fromisoformat(str(row["start_time"])).strftime(
+                "%Y-%m-%d %H:%M"
+            ),
+            escape(row["name"]),
+            _format_duration_cell(row.get("duration")),
+            escape(row.get("category") or "Uncategorized"),
+        ],
+    )
+
+
+def _pages(rows: Iterator[dict], page_size: int) -> Iterator[List[dict]]:
+    while True:
+        page = list(itertools.islice(rows, page_size))
+        if not page:
+            return
+        yield page
+
+
+def print_results(
+    console: Console,
+    rows: Iterator[dict],
+    view: ResultView,
+    fmt: str = "rich",
+    page_size: int = PAGE_SIZE,
+) -> None:
+    """Stream rows to the terminal a page at a time
+    `plain` and `json` skip Rich layout entirely so output can be piped.
+    Views escape user text, so cells are safe to parse as markup."""
+    title, columns, format_row = view
+    try:
+        if fmt == "json":
+            for row in rows:
+                sys.stdout.write(json.dumps(row, default=str) + "\n")
+            return
+
+        if fmt == "plain":
+            print("\t".join(header for header, _ in columns))
+            for row in rows:
+                print("\t".join(Text.from_markup(cell).plain for cell in format_row(row)))
+            return
+
+        # Only pause between pages when someone is there to press Enter
+        interactive = console.is_terminal and sys.stdin.isatty()
+        pages = _pages(rows, page_size)
+        page = next(pages, None)
+        first_page = True
+        while page:
+            table = Table(title=title if first_page else None)
+            for header, options in columns:
+                table.add_column(header, **options)
+            for row in page:
+                table.add_row(*format_row(row))
+            console.print(table)
+            first_page = False
+
+            page = next(pages, None)
+            if page and interactive:
+                answer = console.input("[dim]-- Enter for more, q to quit --[/dim] ")
+                if answer.strip().lower() == "q":
+                    return
+    finally:
+        close = getattr(rows, "close", None)
+        if close:
+            close()
+
+
+def parse_output_options(options: Dict[str, str]) -> Tuple[Optional[int], int, str]:
+    """Validate --limit/--offset/--format values"""
+    try:
+        limit = int(options["limit"]) if "limit" in options else None
+        offset = int(options.get("offset", 0))
+    except ValueError:
+        raise ValueError("--limit and --offset must be whole numbers")
+    if (limit is not None and limit < 0) or offset < 0:
+        raise ValueError("--limit and --offset can't be negative")
+    fmt = options.get("format", "rich").lower()
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"--format must be one of: {', '.join(OUTPUT_FORMATS)}")
+    return limit, offset, fmt
+
 
 class ActivityManager:
-    def __init__(self):
+    def __init__(
+        self,
+        data_dir: Optional[Path] = None,
+        ai_service: Optional[AIService] = None,
+    ):
         # Create data directory in user's home
-        self.data_dir = Path.home() / ".tool-use" / "ai_activity"
-        self.data_dir.mkdir(exist_ok=True)
+        self.data_dir = data_dir or Path.home() / ".tool-use" / "ai_activity"
+        self.data_dir.mkdir(parents=True, exist_ok=True)
 
         # Initialize database
         self.db_path = self.data_dir / "activities.db"
+        # Older versions tracked the running activity in this file
+        self.legacy_state_file = self.data_dir / "current_activity.txt"
         self.init_database()
-
-        # State file to track current activity
-        self.state_file = self.data_dir / "current_activity.txt"
+        self._embedding_index = None  # loaded on the first semantic query
 
         # Initialize AI service
-        self.ai_service = AIService()
+        self.ai_service = ai_service or AIService()
 
-        self.console = Console()
+        # Warnings and errors only, so they never mix into piped results
+        self.console = Console(stderr=True)
 
     def init_database(self):
         """Initialize SQLite database with required tables"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
+        # WAL lets readers and a writer from another terminal work concurrently
+        cursor.execute("PRAGMA journal_mode=WAL")
+
         # Activities table
         cursor.execute(
             """
@@ -90,20 +826,217 @@ class ActivityManager:
         """
         )
 
+        # Denormalized per category counters
+        counters_added = self._ensure_column(
+            cursor, "categories", "activity_count", "INTEGER NOT NULL DEFAULT 0"
+        )
+        self._ensure_column(
+            cursor, "categories", "total_duration", "REAL NOT NULL DEFAULT 0"
+        )
+        for statement in CATEGORY_COUNTER_SCHEMA:
+            cursor.execute(statement)
+        if counters_added:
+            self._rebuild_category_counters(cursor)
+
+        # Per day x category totals, kept current by triggers on activities
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_category_totals'"
+        )
+        needs_backfill = cursor.fetchone() is None
+        for statement in ROLLUP_SCHEMA:
+            cursor.execute(statement)
+        if needs_backfill:
+            self._rebuild_rollups(cursor)
+
+        # Full-text search (skipped on SQLite builds without FTS5)
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'activities_fts'"
+        )
+        fts_exists = cursor.fetchone() is not None
+        try:
+            for statement in FTS_SCHEMA:
+                cursor.execute(statement)
+            if not fts_exists:
+                cursor.execute(
+                    "INSERT INTO activities_fts (activities_fts) VALUES ('rebuild')"
+                )
+            self.fts_enabled = True
+        except sqlite3.OperationalError:
+            self.fts_enabled = False
+
+        for statement in IDLE_SCHEMA:
+            cursor.execute(statement)
+        self._ensure_column(cursor, "idle_intervals", "last_seen", "TIMESTAMP")
+
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'embeddings'"
+        )
+        embeddings_exist = cursor.fetchone() is not None
+        for statement in EMBEDDING_SCHEMA:
+            cursor.execute(statement)
+        if not embeddings_exist:
+            cursor.execute(
+                """
+                INSERT OR IGNORE INTO embedding_queue (kind, text)
+                SELECT DISTINCT 'name', name FROM activities
+                UNION SELECT 'category', name FROM categories
+            """
+            )
+
+        # Cache of validated natural language -> SQL translations
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS query_cache (
+                query TEXT PRIMARY KEY,
+                sql_query TEXT NOT NULL,
+                hits INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """
+        )
+
+        cursor.execute("PRAGMA user_version")
+        if cursor.fetchone()[0] < 1:
+            self._migrate_state_file(cursor)
+            cursor.execute("PRAGMA user_version = 1")
+
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_activities_start ON activities(start_time)"
+        )
+
+        # The running activity is the one open row (end_time IS NULL)
+        cursor.execute(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_activities_running
+            ON activities((end_time IS NULL)) WHERE end_time IS NULL
+        """
+        )
+
         conn.commit()
         conn.close()
 
-    def get_current_activity(self) -> Optional[Tuple[int, str, float]]:
-        """Return current activity if exists: (id, name, start_time)"""
-        if not self.state_file.exists():
+    def _migrate_state_file(self, cursor: sqlite3.Cursor) -> None:
+        """Move running-activity state from current_activity.txt into the database"""
+        running_id = None
+        if self.legacy_state_file.exists():
+            try:
+                running_id = int(self.legacy_state_file.read_text().split("|", 1)[0])
+            except ValueError:
+                pass
+
+        # Open rows the state file didn't point at were abandoned; close them
+        # without a duration so they stay out of the totals
+        cursor.execute(
+            "UPDATE activities SET end_time = start_time WHERE end_time IS NULL AND id IS NOT ?",
+            (running_id,),
+        )
+        if self.legacy_state_file.exists():
+            self.legacy_state_file.unlink()
+
+    @staticmethod
+    def _ensure_column(
+        cursor: sqlite3.Cursor, table: str, column: str, definition: str
+    ) -> bool:
+        """Add a column to an existing table if it is missing; return True if added"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        if any(row[1] == column for row in cursor.fetchall()):
+            return False
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        return True
+
+    @staticmethod
+    def _rebuild_category_counters(cursor: sqlite3.Cursor) -> None:
+        """Recompute the per category counters from the activities table"""
+        cursor.execute(
+            """
+            INSERT INTO categories (name, count)
+            SELECT DISTINCT category, 0 FROM activities WHERE category IS NOT NULL
+            ON CONFLICT(name) DO NOTHING
+        """
+        )
+        cursor.execute(
+            """
+            UPDATE categories SET
+                activity_count = (
+                    SELECT COUNT(*) FROM activities a WHERE a.category = categories.name
+                ),
+                total_duration = (
+                    SELECT COALESCE(SUM(a.duration), 0) FROM activities a
+                    WHERE a.category = categories.name
+                )
+        """
+        )
+
+    @staticmethod
+    def _rebuild_rollups(cursor: sqlite3.Cursor) -> None:
+        """Recompute daily_category_totals from the activities table"""
+        cursor.execute("DELETE FROM daily_category_totals")
+        cursor.execute(
+            """
+            INSERT INTO daily_category_totals (day, category, total_duration, activity_count)
+            SELECT date(start_time), COALESCE(category, 'Uncategorized'), SUM(duration), COUNT(*)
+            FROM activities
+            WHERE duration IS NOT NULL
+            GROUP BY 1, 2
+        """
+        )
+
+    def rebuild_rollups(self) -> None:
+        """Recompute the rollup tables, e.g. after editing the database by hand"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        self._rebuild_category_counters(cursor)
+        self._rebuild_rollups(cursor)
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def _fetch_running(cursor: sqlite3.Cursor) -> Optional[Tuple[int, str, float]]:
+        cursor.execute(
+            "SELECT id, name, start_time FROM activities WHERE end_time IS NULL LIMIT 1"
+        )
+        row = cursor.fetchone()
+        if not row:
             return None
+        activity_id, name, start_time = row
+        start = datetime.datetime.fromisoformat(str(start_time)).timestamp()
+        return activity_id, name, start
 
-        with open(self.state_file, "r") as f:
-            try:
-                activity_id, name, start_time = f.read().strip().split("|")
-                return int(activity_id), name, float(start_time)
-            except (ValueError, IndexError):
-                return None
+    @staticmethod
+    def _idle_seconds(
+        cursor: sqlite3.Cursor, start: datetime.datetime, end: datetime.datetime
+    ) -> float:
+        """Seconds of recorded idle time between start and end
+        An interval still in progress counts up to the monitor's last
+        heartbeat plus the time until its next one (at most `end`), so one
+        left open by a monitor that was killed doesn't keep growing."""
+        cursor.execute(
+            """
+            SELECT COALESCE(SUM(MAX(0,
+                MIN(
+                    COALESCE(
+                        julianday(end_time),
+                        julianday(last_seen) + :grace / 86400.0,
+                        julianday(start_time)
+                    ),
+                    julianday(:end)
+                )
+                - MAX(julianday(start_time), julianday(:start))
+            )), 0) * 86400.0
+            FROM idle_intervals
+            WHERE start_time < :end AND (end_time IS NULL OR end_time > :start)
+        """,
+            {"start": start, "end": end, "grace": idle_monitor.HEARTBEAT_GRACE},
+        )
+        return cursor.fetchone()[0]
+
+    def get_current_activity(self) -> Optional[Tuple[int, str, float]]:
+        """Return current activity if exists: (id, name, start_time)"""
+        conn = sqlite3.connect(self.db_path)
+        current = self._fetch_running(conn.cursor())
+        conn.close()
+        return current
 
     def get_existing_categories(self) -> List[str]:
         """Get list of existing categories ordered by usage"""
@@ -116,31 +1049,30 @@ class ActivityManager:
 
     def start_activity(self, activity_name: str) -> bool:
         """Start tracking a new activity"""
-        current = self.get_current_activity()
-
-        if current:
-            return False
-
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
+        try:
+            # Take the write lock up front so concurrent `ai log` calls serialize
+            cursor.execute("BEGIN IMMEDIATE")
+            if self._fetch_running(cursor):
+                cursor.execute("ROLLBACK")
+                return False
 
-        start_time = time.time()
-        cursor.execute(
-            "INSERT INTO activities (name, start_time) VALUES (?, ?)",
-            (activity_name, datetime.datetime.fromtimestamp(start_time)),
-        )
-        activity_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-
-        # Save current activity state
-        with open(self.state_file, "w") as f:
-            f.write(f"{activity_id}|{activity_name}|{start_time}")
-
-        return True
+            cursor.execute(
+                "INSERT INTO activities (name, start_time) VALUES (?, ?)",
+                (activity_name, datetime.datetime.fromtimestamp(time.time())),
+            )
+            cursor.execute("COMMIT")
+            return True
+        except sqlite3.IntegrityError:
+            # Another invocation started an activity first
+            cursor.execute("ROLLBACK")
+            return False
+        finally:
+            conn.close()
 
-    def categorize_activity(self, activity_name: str) -> str:
-        """Use AI to categorize the activity"""
+    def suggest_category(self, activity_name: str) -> str:
+        """Ask the AI which category fits the activity"""
         existing_categories = self.get_existing_categories()
 
         prompt = f"""Given these existing categories: {', '.join(existing_categories) if existing_categories else 'None yet'},
@@ -149,7 +1081,11 @@ class ActivityManager:
         It is important that these activities are categorized for reporting and analysis, so do not put activities into unrelated categories.
         Respond with just the category name, nothing else."""
 
-        category = self.ai_service.query(prompt).strip()
+        return self.ai_service.query(prompt).strip()
+
+    def categorize_activity(self, activity_name: str) -> str:
+        """Use AI to categorize the activity"""
+        category = self.suggest_category(activity_name)
 
         # Update categories table
         conn = sqlite3.connect(self.db_path)
@@ -167,6 +1103,125 @@ class ActivityManager:
 
         return category
 
+    def _categorize_batch(
+        self,
+        names: List[str],
+        existing_categories: List[str],
+        rate_limiter: _RateLimiter,
+    ) -> Dict[str, str]:
+        """Ask the AI to categorize several activity names in one prompt"""
+        prompt = f"""Given these existing categories: {', '.join(existing_categories) if existing_categories else 'None yet'},
+        assign the best fitting category to each of the activities below.
+        If none fit well, suggest a new category name, and reuse it for similar activities.
+        It is important that these activities are categorized for reporting and analysis, so do not put activities into unrelated categories.
+
+        Activities:
+{json.dumps(names, indent=2)}
+
+        Respond with just a JSON object mapping each activity name exactly as given to its category name, nothing else."""
+
+        rate_limiter.wait()
+        response = self.ai_service.query(prompt, max_tokens=4096)
+        mapping = extract_json_object(response)
+        return {
+            name: str(mapping[name]).strip()
+            for name in names
+            if isinstance(mapping.get(name), str) and mapping[name].strip()
+        }
+
+    def recategorize_activities(
+        self,
+        since: Optional[datetime.datetime] = None,
+        batch_size: int = RECATEGORIZE_BATCH_SIZE,
+        max_workers: int = RECATEGORIZE_MAX_WORKERS,
+    ) -> Tuple[int, int, int]:
+        """Re-run AI categorization over finished activities in batches
+        Returns: (distinct_names, categorized_names, updated_activities)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        query = "SELECT DISTINCT name FROM activities WHERE end_time IS NOT NULL"
+        params: tuple = ()
+        if since:
+            query += " AND start_time >= ?"
+            params = (since,)
+        cursor.execute(query, params)
+        names = [row[0] for row in cursor.fetchall()]
+        conn.close()
+
+        if not names:
+            return 0, 0, 0
+
+        existing_categories = self.get_existing_categories()
+        batches = [
+            names[i : i + batch_size] for i in range(0, len(names), batch_size)
+        ]
+        rate_limiter = _RateLimiter(RECATEGORIZE_MIN_INTERVAL)
+
+        assignments: Dict[str, str] = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    self._categorize_batch, batch, existing_categories, rate_limiter
+                ): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                try:
+                    assignments.update(future.result())
+                except Exception as e:
+                    self.console.print(
+                        f"[yellow]Skipping batch of {len(futures[future])} activities: {e}[/yellow]"
+                    )
+
+        if not assignments:
+            return len(names), 0, 0
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN")
+            scope = "name = ? AND category IS NOT ? AND end_time IS NOT NULL"
+            if since:
+                scope += " AND start_time >= ?"
+                rows = [(name, cat, since) for name, cat in assignments.items()]
+            else:
+                rows = [(name, cat) for name, cat in assignments.items()]
+
+            # Move the usage counts of the categories that actually change
+            # along with the activities; every other counter is left alone
+            # (the counter triggers keep activity_count and create any new
+            # categories)
+            moved: Dict[str, int] = {}
+            for row in rows:
+                cursor.execute(
+                    f"SELECT category, COUNT(*) FROM activities WHERE {scope} GROUP BY category",
+                    row,
+                )
+                for old_category, count in cursor.fetchall():
+                    if old_category is not None:
+                        moved[old_category] = moved.get(old_category, 0) - count
+                    moved[row[1]] = moved.get(row[1], 0) + count
+
+            cursor.executemany(
+                f"UPDATE activities SET category = ? WHERE {scope}",
+                [(row[1], *row) for row in rows],
+            )
+            updated = cursor.rowcount
+            cursor.executemany(
+                "UPDATE categories SET count = MAX(count + ?, 0) WHERE name = ?",
+                [(delta, category) for category, delta in moved.items() if delta],
+            )
+            cursor.execute("COMMIT")
+        except sqlite3.Error as e:
+            self.console.print(f"[red]Error recategorizing activities: {e}[/red]")
+            cursor.execute("ROLLBACK")
+            return len(names), 0, 0
+        finally:
+            conn.close()
+
+        self.clear_query_cache()
+        return len(names), len(assignments), updated
+
     def stop_activity(self) -> Optional[Tuple[str, str, str]]:
         """Stop current activity and return (name, duration_str, category)"""
         current = self.get_current_activity()
@@ -175,80 +1230,244 @@ class ActivityManager:
 
         activity_id, name, start_time = current
         end_time = time.time()
-        duration = end_time - start_time
 
-        # Get AI categorization
-        category = self.categorize_activity(name)
+        # Get AI categorization (outside the transaction, it can be slow)
+        category = self.suggest_category(name)
 
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE activities SET end_time = ?, duration = ?, category = ? WHERE id = ?",
-            (
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            # Time away from the keyboard doesn't count towards the activity
+            idle = self._idle_seconds(
+                cursor,
+                datetime.datetime.fromtimestamp(start_time),
                 datetime.datetime.fromtimestamp(end_time),
-                duration,
-                category,
-                activity_id,
-            ),
+            )
+            duration = max(end_time - start_time - idle, 0)
+            cursor.execute(
+                """
+                UPDATE activities SET end_time = ?, duration = ?, category = ?
+                WHERE id = ? AND end_time IS NULL
+            """,
+                (
+                    datetime.datetime.fromtimestamp(end_time),
+                    duration,
+                    category,
+                    activity_id,
+                ),
+            )
+            if cursor.rowcount == 0:
+                # Another invocation stopped it in the meantime
+                cursor.execute("ROLLBACK")
+                return None
+            cursor.execute(
+                """
+                INSERT INTO categories (name, count)
+                VALUES (?, 1)
+                ON CONFLICT(name) DO UPDATE SET count = count + 1
+            """,
+                (category,),
+            )
+            cursor.execute("COMMIT")
+        finally:
+            conn.close()
+
+        duration_str = self.format_duration(duration)
+        if idle >= 60:
+            duration_str += f" ({self.format_duration(idle)} idle excluded)"
+        return name, duration_str, category
+
+    def get_cached_sql(self, normalized_query: str) -> Optional[str]:
+        """Look up a previously validated translation and mark it as used"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT sql_query FROM query_cache WHERE query = ?", (normalized_query,)
+        )
+        row = cursor.fetchone()
+        if row:
+            cursor.execute(
+                "UPDATE query_cache SET hits = hits + 1, last_used = CURRENT_TIMESTAMP WHERE query = ?",
+                (normalized_query,),
+            )
+            conn.commit()
+        conn.close()
+        return row[0] if row else None
+
+    def cache_sql(self, normalized_query: str, sql_query: str) -> None:
+        """Store a validated translation, skipping ones pinned to literal dates"""
+        if not normalized_query or LITERAL_DATE_RE.search(sql_query):
+            return
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO query_cache (query, sql_query) VALUES (?, ?)
+            ON CONFLICT(query) DO UPDATE SET sql_query = excluded.sql_query,
+                last_used = CURRENT_TIMESTAMP
+        """,
+            (normalized_query, sql_query),
+        )
+        # Keep only the most recently used translations
+        cursor.execute(
+            """
+            DELETE FROM query_cache WHERE query NOT IN (
+                SELECT query FROM query_cache ORDER BY last_used DESC LIMIT ?
+            )
+        """,
+            (QUERY_CACHE_SIZE,),
         )
         conn.commit()
         conn.close()
 
-        if self.state_file.exists():
-            self.state_file.unlink()
+    def evict_cached_sql(self, normalized_query: str) -> None:
+        """Drop a single cached translation"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("DELETE FROM query_cache WHERE query = ?", (normalized_query,))
+        conn.commit()
+        conn.close()
 
-        duration_str = self.format_duration(duration)
-        return name, duration_str, category
+    def clear_query_cache(self) -> None:
+        """Drop all cached translations, e.g. after category names change"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("DELETE FROM query_cache")
+        conn.commit()
+        conn.close()
 
-    def process_query(self, query: str) -> List[dict]:
-        """Process natural language queries about activities with validation and correction"""
-        console = Console()
-        example_templates = {
-            "today": """
-                -- Shows activities from today
-                SELECT name, start_time, duration, category
-                FROM activities 
-                WHERE date(start_time) = date('now', 'localtime')
-                ORDER BY start_time DESC
-            """,
-            "yesterday": """
-                -- Shows activities from yesterday
-                SELECT name, start_time, duration, category
-                FROM activities 
-                WHERE date(start_time) = date('now', '-1 day', 'localtime')
-                ORDER BY start_time DESC
-            """,
-            "time_summary": """
-                -- Shows total time by category for a period
-                SELECT category, SUM(duration) as total_duration, COUNT(*) as activity_count
-                FROM activities 
-                WHERE date(start_time) = date('now', '-1 day', 'localtime')
-                GROUP BY category
-                ORDER BY total_duration DESC
-            """,
-            "longest_activities": """
-                -- Shows activities ordered by duration
-                SELECT name, start_time, duration, category
-                FROM activities
-                WHERE date(start_time) = date('now', '-1 day', 'localtime')
-                ORDER BY duration DESC
-            """,
-            "comparison": """
-                -- Compares two time periods
-                SELECT category,
-                    SUM(CASE WHEN date(start_time) = date('now', 'localtime') THEN duration ELSE 0 END) as today,
-                    SUM(CASE WHEN date(start_time) = date('now', '-1 day', 'localtime') THEN duration ELSE 0 END) as yesterday
-                FROM activities
-                GROUP BY category
-            """,
-            "activity_list": """
-                -- Lists activities with times
-                SELECT name, start_time, duration, category
-                FROM activities
-                WHERE date(start_time) >= date('now', '-7 days', 'localtime')
-                ORDER BY start_time DESC
-            """,
-        }
+    def _connect_readonly(self) -> sqlite3.Connection:
+        """Open a read-only connection that only permits reading statements"""
+        uri = f"{self.db_path.as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True)
+        conn.row_factory = sqlite3.Row
+        conn.set_authorizer(_readonly_authorizer)
+        if self._embedding_index:
+            conn.create_function(
+                "semantic_match",
+                2,
+                self._embedding_index.semantic_match,
+                deterministic=True,
+            )
+        return conn
+
+    def get_embedding_index(self):
+        """Embedding index with everything new embedded, or None if unavailable
+        Needs an AI service with an embedding model (Ollama or OpenAI)."""
+        if self._embedding_index is None:
+            from ..utils.activity_embeddings import EMBED_RETRY_AFTER, EmbeddingIndex
+
+            self._embedding_index = False
+            model = getattr(self.ai_service, "embedding_model", None)
+            key = (self.db_path, model)
+            if model and _embedding_indexes.get(key) is not False:
+                index = _embedding_indexes.get(key) or EmbeddingIndex(
+                    self.db_path, self.ai_service.embed, model
+                )
+                if index.failed_recently():
+                    _embedding_indexes[key] = False
+                    return None
+                try:
+                    index.refresh()  # only calls the embedder for queued text
+                    self._embedding_index = index
+                except Exception as e:
+                    self.console.print(
+                        f"[yellow]Semantic matching unavailable: {escape(str(e))}. "
+                        f"Not retried for {EMBED_RETRY_AFTER // 3600} hours.[/yellow]"
+                    )
+                _embedding_indexes[key] = self._embedding_index
+        return self._embedding_index or None
+
+    def validate_sql(self, sql_query: str) -> Optional[str]:
+        """Check generated SQL with EXPLAIN QUERY PLAN; return an error message or None"""
+        conn = self._connect_readonly()
+        try:
+            conn.execute(f"EXPLAIN QUERY PLAN {sql_query}").fetchall()
+            return None
+        except sqlite3.Error as e:
+            return str(e)
+        finally:
+            conn.close()
+
+    def run_readonly(
+        self,
+        sql_query: str,
+        row_limit: Optional[int] = QUERY_ROW_LIMIT,
+        time_budget: float = QUERY_TIME_BUDGET,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Iterator[dict]:
+        """Stream rows of a read-only query, bounded in time per fetch and in row count
+        An explicit limit/offset is pushed into SQL and replaces the row cap;
+        a row_limit of None streams every row."""
+        params: tuple = ()
+        if limit is not None or offset:
+            sql_query = f"SELECT * FROM (\n{sql_query}\n) LIMIT ? OFFSET ?"
+            params = (-1 if limit is None else limit, offset)
+            if limit is not None:
+                row_limit = limit
+
+        if self._embedding_index:
+            # Embed the topics now, not inside the SQL function where the
+            # time budget would abort the query while the model loads
+            try:
+                for topic in SEMANTIC_TOPIC_RE.findall(sql_query):
+                    self._embedding_index.matches(topic.replace("''", "'"))
+            except Exception as e:
+                raise QueryError(f"Semantic matching failed: {e}") from e
+
+        conn = self._connect_readonly()
+        deadline = [time.monotonic() + time_budget]
+
+        def check_deadline() -> int:
+            # A non-zero return aborts the running statement
+            return 1 if time.monotonic() > deadline[0] else 0
+
+        conn.set_progress_handler(check_deadline, QUERY_PROGRESS_STEPS)
+        try:
+            cursor = conn.execute(sql_query, params)
+            remaining = row_limit
+            while remaining is None or remaining > 0:
+                deadline[0] = time.monotonic() + time_budget
+                rows = cursor.fetchmany(
+                    QUERY_FETCH_SIZE if remaining is None else min(QUERY_FETCH_SIZE, remaining)
+                )
+                if not rows:
+                    return
+                if remaining is not None:
+                    remaining -= len(rows)
+                for row in rows:
+                    yield dict(row)
+            if cursor.fetchone() is not None:
+                self.console.print(
+                    f"[yellow]Result truncated to the first {row_limit} rows, "
+                    "use --limit and --offset to see more[/yellow]"
+                )
+        except sqlite3.OperationalError as e:
+            if "interrupted" in str(e):
+                raise QueryError(
+                    f"Query took longer than {time_budget:g}s and was stopped"
+                ) from e
+            raise QueryError(str(e)) from e
+        finally:
+            conn.close()
+
+    def generate_sql(self, query: str) -> str:
+        """Ask the LLM for SQL answering the query, with one validated correction round"""
+        fts_schema = fts_rule = ""
+        if self.fts_enabled:
+            fts_schema = """
+        -- Full-text index over activities; rowid is activities.id
+        CREATE VIRTUAL TABLE activities_fts USING fts5(name, category);"""
+            fts_rule = """
+        - When the user asks about a specific topic or project, find matching activities with
+          id IN (SELECT rowid FROM activities_fts WHERE activities_fts MATCH 'keyword*') instead of LIKE"""
+
+        semantic_rule = ""
+        if self.get_embedding_index():
+            semantic_rule = """
+        - When the user asks about a kind of activity in their own words (e.g. "admin stuff", "exercise"),
+          filter with semantic_match(name, 'topic') OR semantic_match(category, 'topic'), which is true
+          when the name or category means something similar to the topic"""
 
         # Update the prompt to be more explicit about natural language interpretation
         prompt = f"""Convert this natural language question into a SQL query: "{query}"
@@ -260,7 +1479,7 @@ class ActivityManager:
         - "what did I do the most today" → show today's activities ordered by duration DESC
 
         Here are some example query patterns (but feel free to modify or write your own):
-{example_templates}
+{EXAMPLE_TEMPLATES}
 
         Database schema:
         CREATE TABLE activities (
@@ -271,54 +1490,76 @@ class ActivityManager:
             duration INTEGER,
             category TEXT
         );
+        -- Finished activities pre-aggregated per day (YYYY-MM-DD) and category
+        CREATE TABLE daily_category_totals (
+            day TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total_duration REAL NOT NULL,
+            activity_count INTEGER NOT NULL,
+            PRIMARY KEY (day, category)
+        );{fts_schema}
 
         Write a SQL query that best answers the user's question.
         IMPORTANT: 
-        - Always include name, start_time, duration, and category in the SELECT clause
+        - When listing activities, always include name, start_time, duration, and category in the SELECT clause
+        - For totals per category or per day, query daily_category_totals instead of activities and select category and total_duration{fts_rule}{semantic_rule}
         - Do not use parameter placeholders (?)
         - Write the complete query with all conditions included
         - For "today", use date(start_time) = date('now', 'localtime')
         - For duration-based queries, order by duration DESC
         Respond with just the SQL query, nothing else."""
 
-        sql_query = self.ai_service.query(prompt).strip()
-        # print(f"Generated SQL: {sql_query}")  # TODO: remove after testing
+        sql_query = clean_sql(self.ai_service.query(prompt))
 
-        # Validate and correct if needed
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        try:
-            # Test the query
-            cursor.execute("BEGIN")
-            cursor.execute(sql_query)
-            cursor.execute("ROLLBACK")
-
-            # Execute the actual query and get results
-            cursor.execute(sql_query)
-            results = [dict(row) for row in cursor.fetchall()]
+        error = self.validate_sql(sql_query)
+        if error is None:
+            return sql_query
 
-        except sqlite3.Error as e:
-            print(f"SQL Error: {e}")  # Debug print
-            correction_prompt = f"""The SQL query:
+        correction_prompt = f"""The SQL query:
 {sql_query}
-Failed with error: {str(e)}
+Failed with error: {error}
 
 Here are valid example patterns:
-{example_templates}
-
-Please provide a corrected SQL query that will work."""
-
-            sql_query = self.ai_service.query(correction_prompt).strip()
-            print(f"Corrected SQL: {sql_query}")  # Debug print
-
-            # Execute the corrected query
-            cursor.execute(sql_query)
-            results = [dict(row) for row in cursor.fetchall()]
-
-        conn.close()
-        return results
+{EXAMPLE_TEMPLATES}
+
+Only read-only SELECT queries against the activities table are allowed.
+Please provide a corrected SQL query that will work. Respond with just the SQL query, nothing else."""
+
+        sql_query = clean_sql(self.ai_service.query(correction_prompt))
+
+        error = self.validate_sql(sql_query)
+        if error is not None:
+            raise QueryError(f"Could not build a valid query: {error}")
+        return sql_query
+
+    def process_query(
+        self,
+        query: str,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        row_limit: Optional[int] = QUERY_ROW_LIMIT,
+    ) -> Iterator[dict]:
+        """Process natural language queries about activities with validation and correction
+        Translation happens up front; rows are streamed from a read-only connection."""
+        normalized = normalize_query(query)
+
+        # Common phrasings map straight onto a template, no LLM call needed
+        template_key = match_intent(normalized)
+        if template_key:
+            sql_query = EXAMPLE_TEMPLATES[template_key]
+        else:
+            sql_query = self.get_cached_sql(normalized)
+            if sql_query and "semantic_match" in sql_query:
+                self.get_embedding_index()
+            if sql_query and self.validate_sql(sql_query) is not None:
+                # Stale translation (e.g. schema changed), ask the LLM again
+                self.evict_cached_sql(normalized)
+                sql_query = None
+            if not sql_query:
+                sql_query = self.generate_sql(query)
+                self.cache_sql(normalized, sql_query)
+
+        return self.run_readonly(sql_query, row_limit, limit=limit, offset=offset)
 
     def list_categories(self) -> List[Tuple[str, int, int, float]]:
         """List all categories with their usage counts and activity stats
@@ -327,14 +1568,9 @@ Please provide a corrected SQL query that will work."""
         cursor = conn.cursor()
         cursor.execute(
             """
-            SELECT c.name, 
-                  c.count as usage_count,
-                  COUNT(a.id) as activity_count,
-                  COALESCE(SUM(a.duration), 0) as total_duration
-            FROM categories c
-            LEFT JOIN activities a ON a.category = c.name
-            GROUP BY c.name
-            ORDER BY c.count DESC
+            SELECT name, count as usage_count, activity_count, total_duration
+            FROM categories
+            ORDER BY count DESC
         """
         )
         results = cursor.fetchall()
@@ -347,16 +1583,22 @@ Please provide a corrected SQL query that will work."""
         cursor = conn.cursor()
         try:
             cursor.execute("BEGIN")
-            # Update activities table
+            # Update categories table; counters are re-added by the
+            # triggers as the activities move over
             cursor.execute(
-                "UPDATE activities SET category = ? WHERE category = ?",
+                """
+                UPDATE categories SET name = ?, activity_count = 0, total_duration = 0
+                WHERE name = ?
+            """,
                 (new_name, old_name),
             )
-            # Update categories table
+            # Update activities table
             cursor.execute(
-                "UPDATE categories SET name = ? WHERE name = ?", (new_name, old_name)
+                "UPDATE activities SET category = ? WHERE category = ?",
+                (new_name, old_name),
             )
             cursor.execute("COMMIT")
+            self.clear_query_cache()
             return True
         except sqlite3.Error as e:
             self.console.print(f"[red]Error renaming category: {e}[/red]")
@@ -378,7 +1620,8 @@ Please provide a corrected SQL query that will work."""
             )
             # Get the count from the source category
             cursor.execute("SELECT count FROM categories WHERE name = ?", (from_cat,))
-            from_count = cursor.fetchone()[0]
+            row = cursor.fetchone()
+            from_count = row[0] if row else 0
             # Update the count in the target category
             cursor.execute(
                 "UPDATE categories SET count = count + ? WHERE name = ?",
@@ -387,6 +1630,7 @@ Please provide a corrected SQL query that will work."""
             # Delete the source category
             cursor.execute("DELETE FROM categories WHERE name = ?", (from_cat,))
             cursor.execute("COMMIT")
+            self.clear_query_cache()
             return True
         except sqlite3.Error as e:
             self.console.print(f"[red]Error merging categories: {e}[/red]")
@@ -395,23 +1639,149 @@ Please provide a corrected SQL query that will work."""
         finally:
             conn.close()
 
-    def show_category(self, category_name: str) -> List[dict]:
-        """Show activities in a category"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute(
-            """
+    def show_category(
+        self, category_name: str, limit: Optional[int] = None, offset: int = 0
+    ) -> Iterator[dict]:
+        """Stream activities in a category, newest first"""
+        sql_query = """
             SELECT name, start_time, duration, end_time
             FROM activities
             WHERE category = ?
             ORDER BY start_time DESC
-        """,
-            (category_name,),
+        """
+        return self._stream(sql_query, [category_name], limit, offset)
+
+    def build_report(
+        self,
+        since: Optional[datetime.datetime] = None,
+        until: Optional[datetime.datetime] = None,
+    ) -> dict:
+        """Compute distribution, streak, focus, heatmap and trend metrics locally"""
+        # Imported lazily so starting/stopping activities doesn't load NumPy
+        from ..utils import activity_report
+
+        frame = activity_report.load_activities(self.db_path, since, until)
+        return activity_report.build_report(frame, activity_report.report_end(until))
+
+    def search_activities(
+        self, terms: str, limit: Optional[int] = None, offset: int = 0
+    ) -> Iterator[dict]:
+        """Stream activities matching the search terms, best matches first"""
+        words = re.findall(r"\w+", terms)
+        if not words:
+            return iter(())
+
+        if not self.fts_enabled:
+            # Fallback for SQLite builds without FTS5
+            conditions = " AND ".join(
+                "(name LIKE ? OR category LIKE ?)" for _ in words
+            )
+            params = [f"%{word}%" for word in words for _ in range(2)]
+            sql_query = f"""
+                SELECT name, start_time, duration, category FROM activities
+                WHERE {conditions} ORDER BY start_time DESC
+            """
+            return self._stream(sql_query, params, limit, offset)
+
+        # Quote every word so user input can't be parsed as FTS syntax,
+        # and match prefixes so "migrat" finds "migration"
+        match = " ".join(f'"{word}"*' for word in words)
+        sql_query = """
+            SELECT a.name, a.start_time, a.duration, a.category
+            FROM activities_fts
+            JOIN activities a ON a.id = activities_fts.rowid
+            WHERE activities_fts MATCH ?
+            ORDER BY rank
+        """
+        return self._stream(sql_query, [match], limit, offset)
+
+    def _stream(
+        self,
+        sql_query: str,
+        params: List,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Iterator[dict]:
+        """Stream rows of a parameterized query in fetchmany batches"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            cursor = conn.execute(
+                f"{sql_query} LIMIT ? OFFSET ?",
+                (*params, -1 if limit is None else limit, offset),
+            )
+            while True:
+                rows = cursor.fetchmany(QUERY_FETCH_SIZE)
+                if not rows:
+                    return
+                for row in rows:
+                    yield dict(row)
+        finally:
+            conn.close()
+
+    def export_activities(
+        self,
+        path: str,
+        fmt: Optional[str] = None,
+        since: Optional[datetime.datetime] = None,
+    ) -> int:
+        """Stream the activity history to a file; return the number of rows written"""
+        return activity_io.export_activities(self.db_path, path, fmt, since)
+
+    def import_activities(self, path: str, fmt: Optional[str] = None) -> Tuple[int, int]:
+        """Bulk import finished activities; return (imported, skipped)"""
+        return activity_io.import_activities(self.db_path, path, fmt)
+
+    def sync_activities(self, sync_dir: Path) -> Dict[str, int]:
+        """Exchange activity changes with other devices through sync_dir"""
+        stats = activity_sync.sync(self.db_path, sync_dir)
+        if stats["received"]:
+            self.clear_query_cache()
+        return stats
+
+    def watch_idle(
+        self,
+        probe: idle_monitor.IdleProbe,
+        threshold: float = idle_monitor.IDLE_THRESHOLD,
+    ) -> None:
+        """Record idle intervals until interrupted"""
+        idle_monitor.IdleMonitor(self.db_path, probe, threshold).run()
+
+    def watch_windows(
+        self,
+        probe: window_watcher.WindowProbe,
+        interval: float = window_watcher.SAMPLE_INTERVAL,
+        idle_probe: Optional[idle_monitor.IdleProbe] = None,
+    ) -> None:
+        """Record focused window spans until interrupted"""
+
+        def categorize(labels: List[str]) -> Dict[str, str]:
+            return self._categorize_batch(
+                labels, self.get_existing_categories(), _RateLimiter(0)
+            )
+
+        watcher = window_watcher.WindowWatcher(
+            self.db_path, probe, categorize, interval, idle_probe
         )
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return results
+        watcher.run()
+
+    def idle_summary(self, since: datetime.datetime) -> Tuple[int, float]:
+        """Number of idle intervals and total idle seconds since `since`"""
+        now = datetime.datetime.now()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT COUNT(*) FROM idle_intervals
+                WHERE start_time < ? AND (end_time IS NULL OR end_time > ?)
+            """,
+                (now, since),
+            )
+            count = cursor.fetchone()[0]
+            return count, self._idle_seconds(cursor, since, now)
+        finally:
+            conn.close()
 
     @staticmethod
     def format_duration(seconds: float) -> str:
@@ -431,6 +1801,8 @@ def process_command(args: list[str]) -> None:
     """Process command line arguments"""
     manager = ActivityManager()
     console = Console()
+    # Diagnostics for the commands whose results may be piped (--format json|plain)
+    errors = Console(stderr=True)
 
     # Handle help command
 
@@ -458,7 +1830,9 @@ def process_command(args: list[str]) -> None:
 
             for name, usage_count, activity_count, total_duration in categories:
                 duration_str = manager.format_duration(total_duration)
-                table.add_row(name, str(activity_count), duration_str, str(usage_count))
+                table.add_row(
+                    escape(name), str(activity_count), duration_str, str(usage_count)
+                )
 
             console.print(table)
             return
@@ -494,38 +1868,55 @@ def process_command(args: list[str]) -> None:
             return
 
         elif cmd == "show":
-            if len(args) != 3:
-                console.print("[red]Error:[/red] Please specify a category name")
+            try:
+                positional, options = split_options(
+                    args[2:], ["limit", "offset", "format"]
+                )
+                if len(positional) != 1:
+                    raise ValueError("Please specify a category name")
+                limit, offset, fmt = parse_output_options(options)
+            except ValueError as e:
+                errors.print(f"[red]Error:[/red] {e}")
                 return
-            category = args[2]
-            activities = manager.show_category(category)
-            if not activities:
-                console.print(
+            category = positional[0]
+            activities = manager.show_category(category, limit, offset)
+            first = next(activities, None)
+            if first is None:
+                errors.print(
                     f"[red]No activities found in category '{category}'[/red]"
                 )
                 return
 
-            # Create and display table (indent fixed)
-            table = Table(title=f"Activities in {category}")
-            table.add_column("Date", style="cyan")
-            table.add_column("Activity")
-            table.add_column("Duration", justify="right")
+            print_results(
+                console,
+                itertools.chain([first], activities),
+                category_view(category),
+                fmt,
+            )
+            return
 
-            for activity in activities:
-                start_time = datetime.datetime.fromisoformat(
-                    str(activity["start_time"])
-                )
-                duration = (
-                    manager.format_duration(activity["duration"])
-                    if activity["duration"]
-                    else "[yellow]In progress[/yellow]"
-                )
-                table.add_row(
-                    start_time.strftime("%Y-%m-%d %H:%M"),
-                    activity["name"],
-                    duration,
-                )
-            console.print(table)
+        elif cmd == "recategorize":
+            try:
+                positional, options = split_options(args[2:], ["since"])
+                if positional:
+                    raise ValueError(
+                        "usage: ai log category recategorize [--since <date>]"
+                    )
+                since = parse_since(options["since"]) if "since" in options else None
+            except ValueError as e:
+                console.print(f"[red]Error:[/red] {e}")
+                return
+
+            with console.status("[cyan]Recategorizing activities...[/cyan]"):
+                distinct, categorized, updated = manager.recategorize_activities(since)
+
+            if not distinct:
+                console.print("[red]No finished activities found to recategorize[/red]")
+                return
+            console.print(
+                f"[green]Recategorized {updated} activities "
+                f"({categorized} of {distinct} distinct names)[/green]"
+            )
             return
 
         else:
@@ -559,49 +1950,250 @@ def process_command(args: list[str]) -> None:
             print("  ai log tell me my activities from yesterday")
             return
 
-        query = " ".join(args[1:])
-        results = manager.process_query(query)
+        try:
+            words, options = split_options(args[1:], ["limit", "offset", "format"])
+            limit, offset, fmt = parse_output_options(options)
+        except ValueError as e:
+            errors.print(f"[red]Error:[/red] {e}")
+            return
+
+        query = " ".join(words)
+        try:
+            # Piped output gets every row; the cap only keeps tables readable
+            row_limit = QUERY_ROW_LIMIT if fmt == "rich" else None
+            results = manager.process_query(query, limit, offset, row_limit)
+            first = next(results, None)
+
+            if first is None:
+                errors.print("[red]No activities found for your query.[/red]")
+                return
+
+            print_results(
+                console, itertools.chain([first], results), result_view(first), fmt
+            )
+        except QueryError as e:
+            errors.print(f"[red]Query failed:[/red] {e}")
+        return
 
-        if not results:
-            console.print("[red]No activities found for your query.[/red]")
+    # Case 3: Keyword search
+    if args[0].lower() == "search" and is_command(args, lambda rest: len(rest) == 1):
+        try:
+            words, options = split_options(args[1:], ["limit", "offset", "format"])
+            limit, offset, fmt = parse_output_options(options)
+            if not words:
+                raise ValueError('usage: ai log search "<terms>" [--limit N]')
+        except ValueError as e:
+            errors.print(f"[red]Error:[/red] {e}")
             return
 
-        if "total_duration" in results[0]:
-            # Summary table for aggregated results
-            table = Table(title="Activity Summary")
-            table.add_column("Category", style="cyan")
-            table.add_column("Duration", justify="right")
+        terms = " ".join(words)
+        results = manager.search_activities(terms, limit, offset)
+        first = next(results, None)
+        if first is None:
+            errors.print(f"[red]No activities found matching '{escape(terms)}'[/red]")
+            return
+        print_results(
+            console, itertools.chain([first], results), search_view(terms), fmt
+        )
+        return
 
-            for result in results:
-                category = result.get("category", "Uncategorized")
-                duration = manager.format_duration(result["total_duration"])
-                table.add_row(category, duration)
-        else:
-            # Detailed activity list table
-            table = Table(title="Activities")
-            table.add_column("Time", style="cyan")
-            table.add_column("Activity")
-            table.add_column("Duration", justify="right")
-            table.add_column("Category", style="blue")
-
-            for result in results:
-                start_time = datetime.datetime.fromisoformat(str(result["start_time"]))
-                duration = (
-                    manager.format_duration(result["duration"])
-                    if result["duration"]
-                    else "[yellow]In progress[/yellow]"
+    # Case 4: Built-in analytics report
+    if args[0].lower() == "report" and is_command(args, lambda rest: not rest):
+        from ..utils import activity_report
+
+        try:
+            positional, options = split_options(args[1:], ["since", "until"])
+            if positional:
+                raise ValueError(
+                    "usage: ai log report [--since <date>] [--until <date>]"
                 )
-                table.add_row(
-                    start_time.strftime("%H:%M"),
-                    result["name"],
-                    duration,
-                    result.get("category", "Uncategorized"),
+            until = parse_since(options["until"]) if "until" in options else None
+            since = (
+                parse_since(options["since"])
+                if "since" in options
+                else activity_report.default_since(activity_report.report_end(until))
+            )
+        except ValueError as e:
+            console.print(f"[red]Error:[/red] {e}")
+            return
+
+        report = manager.build_report(since, until)
+        if not report["activities"]:
+            console.print("[red]No finished activities in that period.[/red]")
+            return
+
+        period = f"{since:%Y-%m-%d} to {activity_report.report_end(until):%Y-%m-%d}"
+        activity_report.render_report(
+            console, report, manager.format_duration, f"Activity Report ({period})"
+        )
+        return
+
+    # Case 5: Export / import the activity history
+    if args[0].lower() in ("export", "import") and is_command(args, _is_file_argument):
+        action = args[0].lower()
+        try:
+            positional, options = split_options(args[1:], ["format", "since"])
+            if len(positional) != 1:
+                raise ValueError(
+                    f"usage: ai log {action} <file|-> [--format csv|jsonl|parquet]"
+                    + (" [--since <date>]" if action == "export" else "")
+                )
+            path = positional[0]
+            if action == "export":
+                since = parse_since(options["since"]) if "since" in options else None
+                count = manager.export_activities(path, options.get("format"), since)
+                if path != "-":
+                    console.print(f"[green]Exported {count} activities to {path}[/green]")
+            else:
+                if path != "-" and not Path(path).exists():
+                    raise ValueError(f"File not found: {path}")
+                imported, skipped = manager.import_activities(path, options.get("format"))
+                console.print(
+                    f"[green]Imported {imported} activities[/green]"
+                    + (f" [yellow]({skipped} skipped)[/yellow]" if skipped else "")
                 )
+        except (ValueError, RuntimeError, OSError, sqlite3.Error) as e:
+            console.print(f"[red]Error:[/red] {e}")
+        return
 
-        console.print(table)
+    # Case 6: Sync with other devices
+    if args[0].lower() == "sync" and is_command(args, _is_folder_argument):
+        if len(args) > 2:
+            console.print("[red]Error:[/red] usage: ai log sync [<folder>]")
+            return
+        sync_dir = (
+            Path(args[1]).expanduser()
+            if len(args) == 2
+            else activity_sync.last_sync_dir(manager.db_path)
+        )
+        if sync_dir is None:
+            console.print(
+                "[red]Error:[/red] No sync folder yet. Usage: ai log sync <folder>"
+            )
+            return
+        try:
+            stats = manager.sync_activities(sync_dir)
+        except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+            console.print(f"[red]Error:[/red] {e}")
+            return
+        console.print(
+            f"[green]Synced with {stats['devices']} other device(s):[/green] "
+            f"sent {stats['sent']}, received {stats['received']} changes"
+        )
         return
 
-    # Case 3: Start new activity
+    # Case 7: Idle monitor
+    if args[0].lower() == "idle" and is_command(
+        args, lambda rest: rest in ([], ["status"])
+    ):
+        try:
+            positional, options = split_options(args[1:], ["threshold", "probe"])
+            if positional not in ([], ["status"]):
+                raise ValueError(
+                    "usage: ai log idle [status] [--threshold <minutes>] [--probe <name>]"
+                )
+            threshold = float(options.get("threshold", idle_monitor.IDLE_THRESHOLD / 60))
+            if threshold <= 0:
+                raise ValueError("--threshold must be a positive number of minutes")
+            probe_spec = options.get("probe", "auto")
+            probe = idle_monitor.get_probe(probe_spec)
+        except ValueError as e:
+            console.print(f"[red]Error:[/red] {e}")
+            return
+
+        if positional == ["status"]:
+            console.print(
+                f"[bold]Idle probe:[/bold] {probe_spec}"
+                + ("" if probe else " [red](not available)[/red]")
+            )
+            since = parse_since("today")
+            count, seconds = manager.idle_summary(since)
+            console.print(
+                f"[bold]Idle today:[/bold] {manager.format_duration(seconds)}"
+                f" across {count} interval(s)"
+            )
+            return
+
+        if probe is None:
+            console.print(
+                "[red]Error:[/red] Couldn't read idle time on this system. Install "
+                "xprintidle (X11), run GNOME, or pass --probe file:<path>"
+            )
+            return
+        console.print(
+            f"[green]Watching for idle time[/green] (away after {threshold:g} min "
+            "without input). Press Ctrl+C to stop."
+        )
+        try:
+            manager.watch_idle(probe, threshold * 60)
+        except KeyboardInterrupt:
+            console.print("\n[yellow]Stopped watching idle time[/yellow]")
+        return
+
+    # Case 8: Focused window tracking
+    if args[0].lower() == "watch" and is_command(
+        args, lambda rest: rest in ([], ["summary"])
+    ):
+        try:
+            positional, options = split_options(
+                args[1:], ["interval", "probe", "since"]
+            )
+            if positional not in ([], ["summary"]):
+                raise ValueError(
+                    "usage: ai log watch [summary] [--interval <seconds>] [--probe <name>]"
+                )
+            if positional == ["summary"]:
+                since = parse_since(options.get("since", "today"))
+                categories, windows = window_watcher.summarize(manager.db_path, since)
+                if not categories:
+                    console.print("[yellow]No watched activity in this period[/yellow]")
+                    return
+                table = Table(title=f"Watched Time since {since:%Y-%m-%d}")
+                table.add_column("Category", style="cyan")
+                table.add_column("Time", justify="right")
+                for category, seconds in categories:
+                    table.add_row(escape(category), manager.format_duration(seconds))
+                console.print(table)
+                table = Table(title="Top Windows")
+                table.add_column("Application", style="cyan")
+                table.add_column("Window")
+                table.add_column("Category", style="blue")
+                table.add_column("Time", justify="right")
+                for app, title, category, seconds in windows:
+                    table.add_row(
+                        escape(app),
+                        escape(title),
+                        escape(category),
+                        manager.format_duration(seconds),
+                    )
+                console.print(table)
+                return
+
+            interval = float(options.get("interval", window_watcher.SAMPLE_INTERVAL))
+            if interval <= 0:
+                raise ValueError("--interval must be a positive number of seconds")
+            probe = window_watcher.get_probe(options.get("probe", "auto"))
+        except (ValueError, sqlite3.Error) as e:
+            console.print(f"[red]Error:[/red] {e}")
+            return
+
+        if probe is None:
+            console.print(
+                "[red]Error:[/red] Couldn't read the focused window on this system. "
+                "Install xdotool (X11), or pass --probe file:<path>"
+            )
+            return
+        console.print(
+            f"[green]Watching the focused window every {interval:g}s.[/green] "
+            "Press Ctrl+C to stop."
+        )
+        try:
+            manager.watch_windows(probe, interval, idle_monitor.get_probe("auto"))
+        except KeyboardInterrupt:
+            console.print("\n[yellow]Stopped watching[/yellow]")
+        return
+
+    # Case 9: Start new activity
     activity_name = " ".join(args)
     current = manager.get_current_activity()
 
@@ -630,6 +2222,4 @@ def main(args: List[str]) -> None:
 
 
 if __name__ == "__main__":
-    import sys
-
     main(sys.argv[1:])
@@ -6,7 +6,7 @@ from rich.panel import Panel
 from rich.table import Table
 from rich.text import Text
 from rich import box
-from ..utils.shallowgram import Shallowgram, check_ffmpeg
+from ..utils.shallowgram import RATE, Shallowgram, check_ffmpeg
 from ..utils.ai_service import AIService
 from ..config_manager import config_manager
 from pydantic import BaseModel, Field
@@ -125,6 +125,8 @@ def main(args=None):
     # Get tool config
     tool_config = config_manager.get_tool_config("transcribe")
     whisperfile_path = tool_config.get("whisperfile_path")
+    sample_rate = int(tool_config.get("sample_rate") or RATE)
+    vad = tool_config.get("vad") or "energy"
     
     # Record and transcribe
     try:
@@ -132,16 +134,14 @@ def main(args=None):
         input_path = Path("braindump_recording.wav")
         
         # Initialize Shallowgram
-        client = Shallowgram(whisperfile_path=whisperfile_path)
-        
-        # Record audio
-        from ..utils.shallowgram import record_audio
-        record_audio(str(input_path), verbose=False)
-        
-        console.print("\n[cyan]Processing your brain dump...[/cyan]")
+        client = Shallowgram(
+            whisperfile_path=whisperfile_path,
+            sample_rate=sample_rate,
+            vad=None if vad == "off" else vad,
+        )
         
-        # Transcribe
-        result = client.transcribe(str(input_path))
+        # Record audio, transcribing while it's being recorded
+        result = client.record_and_transcribe(str(input_path))
         transcript = result['text']
         
         # Extract and prioritize tasks
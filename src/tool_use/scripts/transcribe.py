@@ -2,7 +2,15 @@
 import argparse
 import sys
 from pathlib import Path
-from ..utils.shallowgram import Shallowgram, check_ffmpeg
+from ..utils.shallowgram import (
+    CACHE_MAX_BYTES,
+    DEFAULT_VAULT_PATH,
+    RATE,
+    VAD_BACKENDS,
+    Shallowgram,
+    check_ffmpeg,
+    default_workers,
+)
 from ..config_manager import config_manager
 from rich.console import Console
 
@@ -15,31 +23,106 @@ def main(args=None):
     parser = argparse.ArgumentParser(description="Transcribe and analyze audio files")
     parser.add_argument("file", nargs="?", help="Path to the audio file to transcribe")
     parser.add_argument("--output", "-o", help="Output file path (optional)")
+    parser.add_argument(
+        "--batch",
+        metavar="DIR_OR_GLOB",
+        help="Transcribe every audio file in a directory or matching a glob",
+    )
+    parser.add_argument(
+        "--to-vault",
+        action="store_true",
+        help="With --batch, write outputs to the Obsidian vault instead of next to each file",
+    )
     parser.add_argument("--full", "-f", action="store_true", help="Perform full analysis")
+    parser.add_argument(
+        "--structured",
+        action="store_true",
+        help="With --full, get the whole analysis from one structured request",
+    )
+    parser.add_argument(
+        "--vad",
+        choices=[*VAD_BACKENDS, "off"],
+        help="Silence detection backend (default: from config, else energy)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Parallel workers: chunks of a long file, or files with --batch (default: one per 4 cores)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Transcribe and analyze from scratch, without reading or writing the cache",
+    )
+    parser.add_argument(
+        "--no-stream",
+        action="store_true",
+        help="When recording, transcribe only after recording stops",
+    )
     
     args = parser.parse_args(args)
     
     # Get tool config
     tool_config = config_manager.get_tool_config("transcribe")
     whisperfile_path = tool_config.get("whisperfile_path")
-    vault_path = tool_config.get("vault_path")
-    
+    vault_path = tool_config.get("vault_path") or DEFAULT_VAULT_PATH
+    sample_rate = int(tool_config.get("sample_rate") or RATE)
+    vad = args.vad or tool_config.get("vad") or "energy"
+    cache_size_mb = tool_config.get("cache_size_mb")
+    cache_size = int(cache_size_mb) * 1024 * 1024 if cache_size_mb else CACHE_MAX_BYTES
+    context_window = tool_config.get("context_window")
+
+    def make_client(workers=None, threads=None):
+        return Shallowgram(
+            whisperfile_path=whisperfile_path,
+            vault_path=vault_path,
+            sample_rate=sample_rate,
+            vad=None if vad == "off" else vad,
+            workers=workers,
+            structured_analysis=args.structured,
+            use_cache=not args.no_cache,
+            cache_size=cache_size,
+            threads=threads,
+            context_window=int(context_window) if context_window else None,
+        )
+
+    if args.batch:
+        from ..utils.transcribe_batch import run_batch
+        # Files are the unit of parallelism here, so each client works alone
+        counts = run_batch(
+            args.batch,
+            lambda threads: make_client(workers=1, threads=threads),
+            args.workers or default_workers(),
+            full_analysis=args.full,
+            vault_path=vault_path if args.to_vault else None,
+        )
+        sys.exit(1 if counts.get("failed") else 0)
+
     if args.file:
         input_path = Path(args.file)
         if not input_path.exists():
             print(f"Error: File not found: {args.file}")
             sys.exit(1)
     else:
-        # Record mode
-        from ..utils.shallowgram import record_audio
-        print("Recording mode - press Enter to stop recording")
         input_path = Path("recording.wav")
-        record_audio(str(input_path), verbose=False)
-        
+
+    client = None
     try:
-        client = Shallowgram(whisperfile_path=whisperfile_path, vault_path=vault_path)
-        result = client.transcribe(str(input_path), full_analysis=args.full)
-        
+        client = make_client(workers=args.workers)
+        if not args.file:
+            # Record mode
+            print("Recording mode - press Enter to stop recording")
+            if args.no_stream:
+                from ..utils.shallowgram import record_audio
+                record_audio(str(input_path), verbose=False, rate=sample_rate)
+                result = client.transcribe(str(input_path), full_analysis=args.full)
+            else:
+                result = client.record_and_transcribe(
+                    str(input_path), full_analysis=args.full
+                )
+        else:
+            result = client.transcribe(str(input_path), full_analysis=args.full)
+
         if args.full:
             from ..utils.shallowgram import display_rich_output
             display_rich_output(
@@ -62,6 +145,8 @@ def main(args=None):
         print(f"Error during transcription: {str(e)}")
         sys.exit(1)
     finally:
+        if client:
+            client.close()
         # Cleanup recording if we created it
         if not args.file and input_path.exists():
             input_path.unlink()
@@ -0,0 +1,264 @@
+"""Load test for the `ai log` ActivityManager.
+
+Builds synthetic activity histories of the requested sizes in a scratch
+directory, stubs out the AI service, and times the everyday operations:
+starting and stopping activities, category listing/browsing/merging and the
+template queries behind `ai log tell`. Prints latency percentiles and the
+database size so schema and index changes can be compared with numbers.
+
+Usage:
+    python -m tool_use.utils.activity_benchmark --sizes 10000,100000
+"""
+
+import argparse
+import datetime
+import json
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from rich.console import Console
+from rich.table import Table
+
+from ..scripts.activity_tracker import (
+    EXAMPLE_TEMPLATES,
+    PAGE_SIZE,
+    ActivityManager,
+    match_intent,
+    normalize_query,
+)
+
+DEFAULT_SIZES = [10_000, 100_000]
+DEFAULT_REPEAT = 30
+
+CATEGORIES = [
+    "Coding", "Meetings", "Email", "Reading", "Writing", "Exercise", "Cooking",
+    "Planning", "Research", "Design", "Admin", "Learning", "Errands", "Music",
+    "Gaming", "Family", "Travel", "Chores", "Health", "Finance",
+]  # fmt: skip
+VERBS = ["working on", "reviewing", "fixing", "planning", "reading", "writing"]
+OBJECTS = [
+    "python project", "quarterly report", "inbox", "blog post", "garden",
+    "tax return", "client proposal", "workout plan", "slides", "bug tracker",
+]  # fmt: skip
+
+# One phrasing per template, as a user would type it after `ai log tell`
+TEMPLATE_QUERIES = {
+    "today": "what did I do today",
+    "yesterday": "what did I do yesterday",
+    "time_summary": "how much time did I spend yesterday by category",
+    "longest_activities": "what took the longest yesterday",
+    "comparison": "compare today with yesterday",
+    "week_over_week": "compare this week with last week",
+    "activity_list": "show my activities this week",
+}
+
+
+class StubAIService:
+    """Stands in for AIService: answers instantly with a plausible category"""
+
+    def __init__(self, seed: int = 0):
+        self.random = random.Random(seed)
+
+    def query(
+        self, prompt: str, system_prompt: Optional[str] = None, max_tokens: int = 1000
+    ) -> str:
+        return self.random.choice(CATEGORIES)
+
+
+def generate_history(db_path: Path, size: int, seed: int = 0) -> None:
+    """Insert `size` finished activities ending around now, going back in time"""
+    rng = random.Random(seed)
+    # Skewed category popularity, like a real history
+    weights = [1 / (rank + 1) for rank in range(len(CATEGORIES))]
+    moment = datetime.datetime.now() - datetime.timedelta(minutes=5)
+
+    def rows():
+        nonlocal moment
+        for _ in range(size):
+            duration = rng.uniform(5, 120) * 60
+            end = moment - datetime.timedelta(minutes=rng.uniform(0, 45))
+            start = end - datetime.timedelta(seconds=duration)
+            moment = start
+            yield (
+                f"{rng.choice(VERBS)} {rng.choice(OBJECTS)}",
+                start,
+                end,
+                duration,
+                rng.choices(CATEGORIES, weights)[0],
+            )
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("BEGIN")
+    # Triggers keep the rollups, counters and search index current as we go
+    cursor.executemany(
+        """
+        INSERT INTO activities (name, start_time, end_time, duration, category)
+        VALUES (?, ?, ?, ?, ?)
+    """,
+        rows(),
+    )
+    cursor.executemany(
+        """
+        INSERT INTO categories (name, count) VALUES (?, 1)
+        ON CONFLICT(name) DO UPDATE SET count = count + 1
+    """,
+        [(category,) for category in CATEGORIES],
+    )
+    cursor.execute("COMMIT")
+    conn.close()
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted samples"""
+    if not samples:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(samples) + 0.5)) - 1, 0)
+    return samples[min(rank, len(samples) - 1)]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "runs": len(ordered),
+        "mean": sum(ordered) / len(ordered) if ordered else 0.0,
+        "p50": percentile(ordered, 50),
+        "p90": percentile(ordered, 90),
+        "p99": percentile(ordered, 99),
+        "max": ordered[-1] if ordered else 0.0,
+    }
+
+
+def _time(operation: Callable[[], object], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operation()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def database_size(db_path: Path) -> int:
+    """Bytes on disk after folding the WAL back into the main file"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return sum(
+        path.stat().st_size
+        for path in (db_path, db_path.with_name(db_path.name + "-wal"))
+        if path.exists()
+    )
+
+
+def run_benchmark(size: int, repeat: int, seed: int, work_dir: Path) -> dict:
+    """Benchmark one history size; return timings in seconds and the DB size"""
+    data_dir = work_dir / f"activities-{size}"
+    manager = ActivityManager(data_dir=data_dir, ai_service=StubAIService(seed))
+
+    started = time.perf_counter()
+    generate_history(manager.db_path, size, seed)
+    generate_seconds = time.perf_counter() - started
+
+    timings: Dict[str, List[float]] = {}
+    timings["start_activity"] = []
+    timings["stop_activity"] = []
+    for i in range(repeat):
+        timings["start_activity"] += _time(
+            lambda: manager.start_activity(f"benchmark activity {i}"), 1
+        )
+        timings["stop_activity"] += _time(manager.stop_activity, 1)
+
+    timings["list_categories"] = _time(manager.list_categories, repeat)
+    busiest = CATEGORIES[0]
+    timings["show_category page"] = _time(
+        lambda: list(manager.show_category(busiest, limit=PAGE_SIZE)), repeat
+    )
+    timings["show_category all"] = _time(
+        lambda: list(manager.show_category(CATEGORIES[-1])), repeat
+    )
+
+    # Move a whole category back and forth so every run touches the same rows
+    merges = []
+    for i in range(repeat):
+        source, target = (busiest, "Merged") if i % 2 == 0 else ("Merged", busiest)
+        merges += _time(lambda: manager.merge_categories(source, target), 1)
+    timings["merge_categories"] = merges
+
+    for key, query in TEMPLATE_QUERIES.items():
+        assert match_intent(normalize_query(query)) == key, query
+        assert key in EXAMPLE_TEMPLATES
+        timings[f"tell: {key}"] = _time(
+            lambda: list(manager.process_query(query)), repeat
+        )
+
+    return {
+        "size": size,
+        "generate_seconds": generate_seconds,
+        "db_bytes": database_size(manager.db_path),
+        "operations": {name: summarize(samples) for name, samples in timings.items()},
+    }
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.2f}"
+
+
+def render(console: Console, result: dict) -> None:
+    table = Table(
+        title=f"{result['size']:,} activities, "
+        f"{result['db_bytes'] / 1_048_576:.1f} MiB on disk "
+        f"(generated in {result['generate_seconds']:.1f}s)"
+    )
+    table.add_column("Operation", style="cyan")
+    for column in ("runs", "mean", "p50", "p90", "p99", "max"):
+        table.add_column(column if column == "runs" else f"{column} ms", justify="right")
+    for name, stats in result["operations"].items():
+        table.add_row(
+            name,
+            str(stats["runs"]),
+            *(_ms(stats[key]) for key in ("mean", "p50", "p90", "p99", "max")),
+        )
+    console.print(table)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the ai log activity tracker")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="Comma separated history sizes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per operation"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument(
+        "--dir", help="Keep the generated databases in this directory"
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print results as JSON instead of tables"
+    )
+    args = parser.parse_args(argv)
+
+    sizes = [int(size.replace("_", "")) for size in args.sizes.split(",") if size]
+    console = Console(stderr=args.json)
+    results = []
+    with tempfile.TemporaryDirectory() as scratch:
+        work_dir = Path(args.dir) if args.dir else Path(scratch)
+        for size in sizes:
+            with console.status(f"Benchmarking {size:,} activities..."):
+                result = run_benchmark(size, args.repeat, args.seed, work_dir)
+            results.append(result)
+            if not args.json:
+                render(console, result)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Embeddings of activity names and categories for semantic `ai log tell` queries.
+
+Vectors are stored unit-length as float32 blobs in the `embeddings` table.
+Triggers queue every new name and category in `embedding_queue`, so a
+refresh only embeds what was added since the last one, and costs nothing
+but a lookup when the queue is empty. At query time the vectors are loaded
+into one matrix and a topic is matched against all of
+them with a single matrix-vector product.
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+Embedder = Callable[[List[str]], List[List[float]]]
+
+EMBED_BATCH_SIZE = 64
+SEMANTIC_THRESHOLD = 0.6  # minimum cosine similarity to count as a match
+SEMANTIC_TOP_K = 50
+EMBED_RETRY_AFTER = 24 * 3600  # seconds before a model that failed is tried again
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class EmbeddingIndex:
+    """Keeps stored embeddings current and answers topic similarity lookups"""
+
+    def __init__(self, db_path: Path, embed: Embedder, model: str):
+        self.db_path = db_path
+        self.embed = embed
+        self.model = model
+        self._texts: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._matches: Dict[str, Set[str]] = {}
+
+    def failed_recently(self, within: float = EMBED_RETRY_AFTER) -> bool:
+        """Whether a refresh with this model failed less than `within` seconds ago"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute(
+                "SELECT failed_at FROM embedding_failures WHERE model = ?", (self.model,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return row is not None and time.time() - row[0] < within
+
+    def _set_failed(self, failed: bool) -> None:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                if failed:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO embedding_failures (model, failed_at) "
+                        "VALUES (?, ?)",
+                        (self.model, time.time()),
+                    )
+                else:
+                    conn.execute(
+                        "DELETE FROM embedding_failures WHERE model = ?", (self.model,)
+                    )
+        finally:
+            conn.close()
+
+    def refresh(self, batch_size: int = EMBED_BATCH_SIZE) -> int:
+        """Embed everything queued since the last refresh; return how many
+        A failure is recorded, so failed_recently() can skip the model."""
+        try:
+            embedded = self._refresh(batch_size)
+        except Exception:
+            self._set_failed(True)
+            raise
+        if embedded:
+            self._set_failed(False)
+        return embedded
+
+    def _refresh(self, batch_size: int) -> int:
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT 1 FROM embeddings WHERE model != ? LIMIT 1", (self.model,)
+            )
+            if cursor.fetchone():
+                # The embedding model changed; vectors from different models
+                # can't be compared, so start over
+                with conn:
+                    cursor.execute("DELETE FROM embeddings")
+                    cursor.execute(
+                        """
+                        INSERT OR IGNORE INTO embedding_queue (kind, text)
+                        SELECT DISTINCT 'name', name FROM activities
+                        UNION SELECT 'category', name FROM categories
+                    """
+                    )
+
+            embedded = 0
+            while True:
+                cursor.execute(
+                    "SELECT kind, text FROM embedding_queue LIMIT ?", (batch_size,)
+                )
+                batch = cursor.fetchall()
+                if not batch:
+                    break
+                vectors = _normalize(
+                    np.asarray(self.embed([text for _, text in batch]), dtype=np.float32)
+                )
+                with conn:
+                    cursor.executemany(
+                        """
+                        INSERT OR REPLACE INTO embeddings (kind, text, model, vector)
+                        VALUES (?, ?, ?, ?)
+                    """,
+                        [
+                            (kind, text, self.model, vector.tobytes())
+                            for (kind, text), vector in zip(batch, vectors)
+                        ],
+                    )
+                    cursor.executemany(
+                        "DELETE FROM embedding_queue WHERE kind = ? AND text = ?", batch
+                    )
+                embedded += len(batch)
+        finally:
+            conn.close()
+
+        if embedded:
+            self._matrix = None  # reloaded by the next lookup
+        return embedded
+
+    def _load(self) -> None:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute(
+                "SELECT text, vector FROM embeddings WHERE model = ?", (self.model,)
+            ).fetchall()
+        finally:
+            conn.close()
+        self._texts = [text for text, _ in rows]
+        self._matrix = (
+            np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+            if rows
+            else np.zeros((0, 0), dtype=np.float32)
+        )
+        self._matches = {}
+
+    def matches(self, topic: str) -> Set[str]:
+        """Names and categories whose meaning is close to `topic`"""
+        key = topic.strip().lower()
+        if self._matrix is None:
+            self._load()
+        if key not in self._matches:
+            if not len(self._texts):
+                self._matches[key] = set()
+            else:
+                query = _normalize(np.asarray(self.embed([key])[0], dtype=np.float32))
+                scores = self._matrix @ query
+                best = np.argsort(-scores)[:SEMANTIC_TOP_K]
+                self._matches[key] = {
+                    self._texts[i] for i in best if scores[i] >= SEMANTIC_THRESHOLD
+                }
+                # Literal mentions always count
+                self._matches[key].update(
+                    text for text in self._texts if key in text.lower()
+                )
+        return self._matches[key]
+
+    def semantic_match(self, value: Optional[str], topic: Optional[str]) -> int:
+        """SQL function: 1 if value is semantically close to topic"""
+        if value is None or not topic:
+            return 0
+        return int(value in self.matches(topic))
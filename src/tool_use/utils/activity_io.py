@@ -0,0 +1,247 @@
+"""Streaming export and import of the `ai log` activity history.
+
+Rows move in fixed-size batches so memory stays bounded no matter how much
+history there is. CSV and JSONL use the standard library; Parquet needs the
+optional pyarrow package.
+"""
+
+import csv
+import datetime
+import json
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+EXPORT_COLUMNS = ["name", "start_time", "end_time", "duration", "category"]
+BATCH_SIZE = 1000
+FORMATS = ("csv", "jsonl", "parquet")
+
+_EXTENSIONS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".json": "jsonl",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+}
+
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+    """Pick the file format from an explicit --format or the file extension"""
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in FORMATS:
+            raise ValueError(
+                f"Unknown format '{fmt}'. Use one of: {', '.join(FORMATS)}"
+            )
+        return fmt
+    if path == "-":
+        return "jsonl"
+    detected = _EXTENSIONS.get(Path(path).suffix.lower())
+    if not detected:
+        raise ValueError(
+            f"Can't tell the format of '{path}'. Pass --format {'|'.join(FORMATS)}"
+        )
+    return detected
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError(
+            "Parquet support requires pyarrow. Install it with: pip install pyarrow"
+        )
+    return pyarrow, pyarrow.parquet
+
+
+def _iter_batches(
+    conn: sqlite3.Connection, since: Optional[datetime.datetime]
+) -> Iterator[List[tuple]]:
+    query = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM activities"
+    params: tuple = ()
+    if since:
+        query += " WHERE start_time >= ?"
+        params = (since,)
+    cursor = conn.execute(query + " ORDER BY start_time", params)
+    while True:
+        rows = cursor.fetchmany(BATCH_SIZE)
+        if not rows:
+            return
+        yield rows
+
+
+def _write_csv(batches: Iterable[List[tuple]], out) -> int:
+    writer = csv.writer(out)
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    for rows in batches:
+        writer.writerows(rows)
+        count += len(rows)
+    return count
+
+
+def _write_jsonl(batches: Iterable[List[tuple]], out) -> int:
+    count = 0
+    for rows in batches:
+        out.writelines(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in rows
+        )
+        count += len(rows)
+    return count
+
+
+def _write_parquet(batches: Iterable[List[tuple]], path: str) -> int:
+    pa, pq = _require_pyarrow()
+    schema = pa.schema(
+        [
+            ("name", pa.string()),
+            ("start_time", pa.string()),
+            ("end_time", pa.string()),
+            ("duration", pa.float64()),
+            ("category", pa.string()),
+        ]
+    )
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_batch(
+                pa.RecordBatch.from_arrays(
+                    [
+                        pa.array(column, type=field.type)
+                        for column, field in zip(columns, schema)
+                    ],
+                    schema=schema,
+                )
+            )
+            count += len(rows)
+    return count
+
+
+def export_activities(
+    db_path: Path,
+    path: str,
+    fmt: Optional[str] = None,
+    since: Optional[datetime.datetime] = None,
+) -> int:
+    """Stream activities to a CSV, JSONL or Parquet file ('-' for stdout); return row count"""
+    fmt = detect_format(path, fmt)
+    conn = sqlite3.connect(db_path)
+    try:
+        batches = _iter_batches(conn, since)
+        if fmt == "parquet":
+            if path == "-":
+                raise ValueError("Parquet can't be written to stdout")
+            return _write_parquet(batches, path)
+        writer = _write_csv if fmt == "csv" else _write_jsonl
+        if path == "-":
+            return writer(batches, sys.stdout)
+        with open(path, "w", newline="", encoding="utf-8") as out:
+            return writer(batches, out)
+    finally:
+        conn.close()
+
+
+def _read_records(path: str, fmt: str) -> Iterator[dict]:
+    if fmt == "parquet":
+        _, pq = _require_pyarrow()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=BATCH_SIZE):
+            yield from batch.to_pylist()
+        return
+
+    source = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    try:
+        if fmt == "csv":
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+
+def _parse_time(value) -> Optional[datetime.datetime]:
+    """Parse a timestamp into naive local time, as stored by the tracker"""
+    if value in (None, ""):
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.datetime.fromtimestamp(value)
+    if isinstance(value, datetime.datetime):
+        parsed = value
+    else:
+        text = str(value).strip().replace("Z", "+00:00")
+        parsed = datetime.datetime.fromisoformat(text)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def normalize_record(record: dict) -> Optional[Tuple]:
+    """Turn an imported record into an activities row, or None if it's unusable
+    Only finished activities are imported; the missing one of end_time/duration is derived."""
+    name = (record.get("name") or "").strip()
+    start = _parse_time(record.get("start_time"))
+    if not name or start is None:
+        return None
+
+    end = _parse_time(record.get("end_time"))
+    duration = record.get("duration")
+    duration = float(duration) if duration not in (None, "") else None
+    if end is None and duration is not None:
+        end = start + datetime.timedelta(seconds=duration)
+    if end is None:
+        return None
+    if duration is None:
+        duration = (end - start).total_seconds()
+
+    category = (record.get("category") or "").strip() or None
+    return name, start, end, duration, category
+
+
+def import_activities(
+    db_path: Path, path: str, fmt: Optional[str] = None
+) -> Tuple[int, int]:
+    """Bulk import activities in one transaction; return (imported, skipped)
+    Rows already present (same name and start time) are skipped."""
+    fmt = detect_format(path, fmt)
+    seen = 0
+
+    def rows() -> Iterator[Tuple]:
+        nonlocal seen
+        for record in _read_records(path, fmt):
+            seen += 1
+            try:
+                row = normalize_record(record)
+            except (TypeError, ValueError):
+                row = None
+            if row is not None:
+                yield row + (row[0], row[1])
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.executemany(
+            """
+            INSERT INTO activities (name, start_time, end_time, duration, category)
+            SELECT ?, ?, ?, ?, ?
+            WHERE NOT EXISTS (
+                SELECT 1 FROM activities WHERE name = ? AND start_time = ?
+            )
+        """,
+            rows(),
+        )
+        imported = max(cursor.rowcount, 0)
+        cursor.execute("COMMIT")
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    return imported, seen - imported
@@ -0,0 +1,349 @@
+"""Deterministic analytics for `ai log report`.
+
+Finished activities in the selected range are loaded once into columnar
+NumPy arrays and every metric is computed with vectorized operations, so the
+report needs no LLM round trip and stays fast on multi-year histories.
+
+Times are handled as "local epoch" seconds: the naive local timestamps stored
+by the tracker are read as if they were UTC. Day and hour boundaries then fall
+on plain multiples of 86400 and 3600 without any timezone arithmetic.
+"""
+
+import datetime
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from rich import box
+from rich.console import Console
+from rich.markup import escape
+from rich.panel import Panel
+from rich.table import Table
+from rich.text import Text
+
+DAY = 86400
+HOUR = 3600
+# 1970-01-01 was a Thursday; shift so weeks and weekdays start on Monday
+EPOCH_WEEKDAY = 3
+
+FOCUS_MIN_SECONDS = 25 * 60  # a focus block lasts at least this long
+FOCUS_MAX_GAP = 5 * 60  # activities closer than this join the same block
+TREND_WEEKS = 8
+HEATMAP_SHADES = " ░▒▓█"
+SPARKLINE = "▁▂▃▄▅▆▇█"
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+LOAD_BATCH_SIZE = 5000
+
+
+class ActivityFrame:
+    """Columnar view of finished activities"""
+
+    def __init__(
+        self,
+        start: np.ndarray,
+        duration: np.ndarray,
+        category: np.ndarray,
+        categories: List[str],
+    ):
+        self.start = start  # local epoch seconds, float64, sorted
+        self.duration = duration  # seconds, float64
+        self.category = category  # index into categories, int32
+        self.categories = categories
+
+    @property
+    def end(self) -> np.ndarray:
+        return self.start + self.duration
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+
+def _local_epoch(moment: datetime.datetime) -> float:
+    naive = moment.replace(tzinfo=None)
+    return (naive - datetime.datetime(1970, 1, 1)).total_seconds()
+
+
+def load_activities(
+    db_path: Path,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+) -> ActivityFrame:
+    """Load finished activities in [since, until) into columnar arrays"""
+    query = """
+        SELECT (julianday(start_time) - 2440587.5) * 86400.0,
+               duration,
+               COALESCE(category, 'Uncategorized')
+        FROM activities
+        WHERE duration IS NOT NULL
+    """
+    params = []
+    if since:
+        query += " AND start_time >= ?"
+        params.append(since)
+    if until:
+        query += " AND start_time < ?"
+        params.append(until)
+
+    conn = sqlite3.connect(db_path)
+    starts: List[float] = []
+    durations: List[float] = []
+    codes: List[int] = []
+    category_codes: Dict[str, int] = {}
+    try:
+        cursor = conn.execute(query + " ORDER BY start_time", params)
+        while True:
+            rows = cursor.fetchmany(LOAD_BATCH_SIZE)
+            if not rows:
+                break
+            for start, duration, category in rows:
+                starts.append(start)
+                durations.append(duration)
+                code = category_codes.setdefault(category, len(category_codes))
+                codes.append(code)
+    finally:
+        conn.close()
+
+    return ActivityFrame(
+        np.array(starts, dtype=np.float64),
+        np.clip(np.array(durations, dtype=np.float64), 0, None),
+        np.array(codes, dtype=np.int32),
+        list(category_codes),
+    )
+
+
+def category_distribution(frame: ActivityFrame) -> List[dict]:
+    """Total, share, count and typical length of activities per category"""
+    n = len(frame.categories)
+    totals = np.bincount(frame.category, weights=frame.duration, minlength=n)
+    counts = np.bincount(frame.category, minlength=n)
+    grand_total = totals.sum()
+
+    # Medians per category from one sort by (category, duration)
+    order = np.lexsort((frame.duration, frame.category))
+    sorted_durations = frame.duration[order]
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    lower = sorted_durations[offsets[:-1] + (counts - 1) // 2]
+    upper = sorted_durations[offsets[:-1] + counts // 2]
+    medians = (lower + upper) / 2
+
+    return [
+        {
+            "category": frame.categories[i],
+            "total": float(totals[i]),
+            "share": float(totals[i] / grand_total) if grand_total else 0.0,
+            "count": int(counts[i]),
+            "median": float(medians[i]),
+        }
+        for i in np.argsort(-totals)
+    ]
+
+
+def day_streaks(frame: ActivityFrame, today: int) -> dict:
+    """Current and longest runs of consecutive days with tracked activity"""
+    days = np.unique((frame.start // DAY).astype(np.int64))
+    if len(days) == 0:
+        return {"active_days": 0, "current": 0, "longest": 0}
+
+    # A new run starts wherever the gap to the previous active day isn't 1
+    breaks = np.flatnonzero(np.diff(days) != 1) + 1
+    run_starts = np.concatenate(([0], breaks))
+    run_lengths = np.diff(np.concatenate((run_starts, [len(days)])))
+
+    # The current streak may end today or yesterday (today isn't over yet)
+    current = int(run_lengths[-1]) if days[-1] >= today - 1 else 0
+    return {
+        "active_days": int(len(days)),
+        "current": current,
+        "longest": int(run_lengths.max()),
+    }
+
+
+def focus_blocks(frame: ActivityFrame) -> dict:
+    """Stretches of back-to-back activity at least FOCUS_MIN_SECONDS long"""
+    if len(frame) == 0:
+        return {"count": 0, "total": 0.0, "longest": 0.0, "average": 0.0}
+
+    end = frame.end
+    gaps = frame.start[1:] - np.maximum.accumulate(end)[:-1]
+    block_id = np.concatenate(([0], np.cumsum(gaps > FOCUS_MAX_GAP)))
+    lengths = np.bincount(block_id, weights=frame.duration)
+    focused = lengths[lengths >= FOCUS_MIN_SECONDS]
+    return {
+        "count": int(len(focused)),
+        "total": float(focused.sum()),
+        "longest": float(focused.max()) if len(focused) else 0.0,
+        "average": float(focused.mean()) if len(focused) else 0.0,
+    }
+
+
+def hourly_heatmap(frame: ActivityFrame) -> np.ndarray:
+    """Seconds tracked per weekday x hour, splitting activities across hours"""
+    heat = np.zeros((7, 24))
+    if len(frame) == 0:
+        return heat
+
+    start, end = frame.start, frame.end
+    first_slot = np.floor(start / HOUR).astype(np.int64)
+    last_slot = np.maximum(np.ceil(end / HOUR).astype(np.int64) - 1, first_slot)
+    slots_per_activity = last_slot - first_slot + 1
+
+    # One entry per (activity, hour slot) it touches
+    owner = np.repeat(np.arange(len(frame)), slots_per_activity)
+    within = np.arange(len(owner)) - np.repeat(
+        np.cumsum(slots_per_activity) - slots_per_activity, slots_per_activity
+    )
+    slot = first_slot[owner] + within
+    overlap = np.minimum(end[owner], (slot + 1) * HOUR) - np.maximum(
+        start[owner], slot * HOUR
+    )
+
+    weekday = (slot // 24 + EPOCH_WEEKDAY) % 7
+    np.add.at(heat, (weekday, slot % 24), np.clip(overlap, 0, None))
+    return heat
+
+
+def weekly_trends(
+    frame: ActivityFrame, today: int, weeks: int = TREND_WEEKS
+) -> List[dict]:
+    """Per category totals for each of the last `weeks` weeks (Monday-based)"""
+    current_week = (today + EPOCH_WEEKDAY) // 7
+    week = ((frame.start // DAY).astype(np.int64) + EPOCH_WEEKDAY) // 7
+    offset = week - (current_week - weeks + 1)
+    recent = (offset >= 0) & (offset < weeks)
+
+    matrix = np.zeros((len(frame.categories), weeks))
+    np.add.at(
+        matrix, (frame.category[recent], offset[recent]), frame.duration[recent]
+    )
+
+    trends = []
+    for i in np.argsort(-matrix.sum(axis=1)):
+        if not matrix[i].any():
+            continue
+        trends.append(
+            {
+                "category": frame.categories[i],
+                "weekly": matrix[i],
+                "this_week": float(matrix[i, -1]),
+                "last_week": float(matrix[i, -2]) if weeks > 1 else 0.0,
+            }
+        )
+    return trends
+
+
+def report_end(until: Optional[datetime.datetime] = None) -> datetime.datetime:
+    """Last moment a report up to `until` (exclusive) covers, at the latest now"""
+    now = datetime.datetime.now()
+    return min(until - datetime.timedelta(microseconds=1), now) if until else now
+
+
+def default_since(now: Optional[datetime.datetime] = None) -> datetime.datetime:
+    """Start of the Monday TREND_WEEKS - 1 weeks before `now` (the end of the
+    report, by default today), so every trend week is complete"""
+    today = (now or datetime.datetime.now()).date()
+    monday = today - datetime.timedelta(days=today.weekday(), weeks=TREND_WEEKS - 1)
+    return datetime.datetime.combine(monday, datetime.time())
+
+
+def build_report(
+    frame: ActivityFrame, now: Optional[datetime.datetime] = None
+) -> dict:
+    """Compute every report metric from the loaded activities
+    `now` is the end of the reported period (default: now); the trend weeks
+    and the current streak are counted back from it."""
+    today = int(_local_epoch(now or datetime.datetime.now()) // DAY)
+    return {
+        "activities": len(frame),
+        "total": float(frame.duration.sum()),
+        "distribution": category_distribution(frame),
+        "streaks": day_streaks(frame, today),
+        "focus": focus_blocks(frame),
+        "heatmap": hourly_heatmap(frame),
+        "trends": weekly_trends(frame, today),
+    }
+
+
+def _sparkline(values: np.ndarray) -> str:
+    peak = values.max()
+    if peak <= 0:
+        return SPARKLINE[0] * len(values)
+    levels = np.round(values / peak * (len(SPARKLINE) - 1)).astype(int)
+    return "".join(SPARKLINE[level] for level in levels)
+
+
+def render_report(
+    console: Console, report: dict, format_duration, title: str
+) -> None:
+    """Print the report with Rich"""
+    focus = report["focus"]
+    streaks = report["streaks"]
+    overview = Table(show_header=False, box=box.SIMPLE)
+    overview.add_column(style="bold")
+    overview.add_column(justify="right")
+    overview.add_row("Activities", str(report["activities"]))
+    overview.add_row("Tracked time", format_duration(report["total"]))
+    overview.add_row("Active days", str(streaks["active_days"]))
+    overview.add_row("Current streak", f"{streaks['current']} days")
+    overview.add_row("Longest streak", f"{streaks['longest']} days")
+    overview.add_row(
+        "Focus blocks",
+        f"{focus['count']} ({format_duration(focus['total'])} total)",
+    )
+    overview.add_row("Longest focus block", format_duration(focus["longest"]))
+    overview.add_row("Average focus block", format_duration(focus["average"]))
+    console.print(Panel(overview, title=title, border_style="cyan"))
+
+    distribution = Table(title="Time by Category")
+    distribution.add_column("Category", style="cyan")
+    distribution.add_column("Total", justify="right")
+    distribution.add_column("Share", justify="right")
+    distribution.add_column("Activities", justify="right")
+    distribution.add_column("Median", justify="right")
+    for row in report["distribution"]:
+        distribution.add_row(
+            escape(row["category"]),
+            format_duration(row["total"]),
+            f"{row['share']:.0%}",
+            str(row["count"]),
+            format_duration(row["median"]),
+        )
+    console.print(distribution)
+
+    heat = report["heatmap"]
+    peak = heat.max()
+    heatmap = Table(title="When You Work (hour of day)", box=box.SIMPLE, padding=0)
+    heatmap.add_column("", style="bold")
+    for hour in range(24):
+        heatmap.add_column(str(hour) if hour % 3 == 0 else "", justify="center")
+    for day, values in enumerate(heat):
+        levels = (
+            np.ceil(values / peak * (len(HEATMAP_SHADES) - 1)).astype(int)
+            if peak > 0
+            else np.zeros(24, dtype=int)
+        )
+        heatmap.add_row(
+            WEEKDAYS[day], *(HEATMAP_SHADES[level] * 2 for level in levels)
+        )
+    console.print(heatmap)
+
+    if report["trends"]:
+        trends = Table(title=f"Weekly Trend (last {TREND_WEEKS} weeks)")
+        trends.add_column("Category", style="cyan")
+        trends.add_column("Trend")
+        trends.add_column("This week", justify="right")
+        trends.add_column("Change", justify="right")
+        for row in report["trends"]:
+            if row["last_week"]:
+                change = (row["this_week"] - row["last_week"]) / row["last_week"]
+                color = "green" if change >= 0 else "red"
+                change_text = Text(f"{change:+.0%}", style=color)
+            else:
+                change_text = Text("new" if row["this_week"] else "-", style="dim")
+            trends.add_row(
+                escape(row["category"]),
+                _sparkline(row["weekly"]),
+                format_duration(row["this_week"]),
+                change_text,
+            )
+        console.print(trends)
@@ -0,0 +1,299 @@
+"""Incremental sync of `ai log` activity history between devices.
+
+Every activity row carries a UUID and a Lamport clock stamped by triggers,
+which also queue the row in an outbox. `sync` appends queued changes to this
+device's feed file (``<device_id>.jsonl``) in a shared folder, then reads
+only the new bytes of every other device's feed. Conflicts are resolved
+deterministically: the higher (clock, device_id) wins, deletes included.
+"""
+
+import json
+import os
+import sqlite3
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+SYNC_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS sync_state (
+        key TEXT PRIMARY KEY,
+        value
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sync_outbox (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        uuid TEXT NOT NULL,
+        op TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sync_tombstones (
+        uuid TEXT PRIMARY KEY,
+        clock INTEGER NOT NULL,
+        device TEXT NOT NULL
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_activities_uuid ON activities(uuid)",
+    # Local writes get the next clock value and are queued for export. Changes
+    # applied from other devices run with `applying` set and are not echoed.
+    """
+    CREATE TRIGGER IF NOT EXISTS sync_after_insert
+    AFTER INSERT ON activities
+    WHEN (SELECT value FROM sync_state WHERE key = 'applying') = 0
+    BEGIN
+        UPDATE sync_state SET value = value + 1 WHERE key = 'clock';
+        UPDATE activities SET
+            uuid = COALESCE(NEW.uuid, lower(hex(randomblob(16)))),
+            clock = (SELECT value FROM sync_state WHERE key = 'clock'),
+            device = (SELECT value FROM sync_state WHERE key = 'device_id')
+        WHERE id = NEW.id;
+        INSERT INTO sync_outbox (uuid, op)
+        SELECT uuid, 'upsert' FROM activities WHERE id = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS sync_after_update
+    AFTER UPDATE OF name, start_time, end_time, duration, category ON activities
+    WHEN (SELECT value FROM sync_state WHERE key = 'applying') = 0
+    BEGIN
+        UPDATE sync_state SET value = value + 1 WHERE key = 'clock';
+        UPDATE activities SET
+            clock = (SELECT value FROM sync_state WHERE key = 'clock'),
+            device = (SELECT value FROM sync_state WHERE key = 'device_id')
+        WHERE id = NEW.id;
+        INSERT INTO sync_outbox (uuid, op) VALUES (NEW.uuid, 'upsert');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS sync_after_delete
+    AFTER DELETE ON activities
+    WHEN OLD.uuid IS NOT NULL
+        AND (SELECT value FROM sync_state WHERE key = 'applying') = 0
+    BEGIN
+        UPDATE sync_state SET value = value + 1 WHERE key = 'clock';
+        INSERT OR REPLACE INTO sync_tombstones (uuid, clock, device)
+        VALUES (
+            OLD.uuid,
+            (SELECT value FROM sync_state WHERE key = 'clock'),
+            (SELECT value FROM sync_state WHERE key = 'device_id')
+        );
+        INSERT INTO sync_outbox (uuid, op) VALUES (OLD.uuid, 'delete');
+    END
+    """,
+]
+
+ROW_FIELDS = ["name", "start_time", "end_time", "duration", "category"]
+
+
+def _ensure_column(cursor: sqlite3.Cursor, column: str, definition: str) -> bool:
+    cursor.execute("PRAGMA table_info(activities)")
+    if any(row[1] == column for row in cursor.fetchall()):
+        return False
+    cursor.execute(f"ALTER TABLE activities ADD COLUMN {column} {definition}")
+    return True
+
+
+def _get(cursor: sqlite3.Cursor, key: str, default=None):
+    cursor.execute("SELECT value FROM sync_state WHERE key = ?", (key,))
+    row = cursor.fetchone()
+    return row[0] if row else default
+
+
+def _set(cursor: sqlite3.Cursor, key: str, value) -> None:
+    cursor.execute(
+        "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, value)
+    )
+
+
+def enable_sync(cursor: sqlite3.Cursor) -> str:
+    """Install the sync columns, tables and triggers; return this device's id
+    The first time, every existing activity is stamped and queued for export."""
+    _ensure_column(cursor, "uuid", "TEXT")
+    _ensure_column(cursor, "clock", "INTEGER NOT NULL DEFAULT 0")
+    _ensure_column(cursor, "device", "TEXT")
+    for statement in SYNC_SCHEMA[:3]:
+        cursor.execute(statement)
+
+    device_id = _get(cursor, "device_id")
+    if device_id is None:
+        device_id = uuid.uuid4().hex
+        _set(cursor, "device_id", device_id)
+        _set(cursor, "clock", 0)
+        _set(cursor, "applying", 0)
+        cursor.execute(
+            """
+            UPDATE activities SET uuid = lower(hex(randomblob(16))), device = ?
+            WHERE uuid IS NULL
+        """,
+            (device_id,),
+        )
+        cursor.execute(
+            "INSERT INTO sync_outbox (uuid, op) SELECT uuid, 'upsert' FROM activities"
+        )
+
+    for statement in SYNC_SCHEMA[3:]:
+        cursor.execute(statement)
+    return device_id
+
+
+def _export(cursor: sqlite3.Cursor, feed: Path) -> int:
+    """Append queued local changes to this device's feed; return how many"""
+    cursor.execute("SELECT uuid, MAX(seq) FROM sync_outbox GROUP BY uuid ORDER BY 2")
+    pending = cursor.fetchall()
+
+    lines: List[str] = []
+    sent: List[Tuple[str, int]] = []
+    for row_uuid, max_seq in pending:
+        cursor.execute(
+            f"SELECT {', '.join(ROW_FIELDS)}, clock, device FROM activities WHERE uuid = ?",
+            (row_uuid,),
+        )
+        row = cursor.fetchone()
+        if row is not None:
+            record = dict(zip(ROW_FIELDS + ["clock", "device"], row))
+            if record["end_time"] is None:
+                # Running activities are shared once they're stopped
+                continue
+            record.update(op="upsert", uuid=row_uuid)
+        else:
+            cursor.execute(
+                "SELECT clock, device FROM sync_tombstones WHERE uuid = ?", (row_uuid,)
+            )
+            tombstone = cursor.fetchone()
+            if tombstone is None:
+                continue
+            record = {
+                "op": "delete",
+                "uuid": row_uuid,
+                "clock": tombstone[0],
+                "device": tombstone[1],
+            }
+        lines.append(json.dumps(record, default=str) + "\n")
+        sent.append((row_uuid, max_seq))
+
+    if lines:
+        with open(feed, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        cursor.executemany(
+            "DELETE FROM sync_outbox WHERE uuid = ? AND seq <= ?", sent
+        )
+    return len(lines)
+
+
+def _wins(incoming: Tuple[int, str], current: Optional[Tuple[int, str]]) -> bool:
+    return current is None or (incoming[0], incoming[1] or "") > (
+        current[0],
+        current[1] or "",
+    )
+
+
+def _apply(cursor: sqlite3.Cursor, record: dict) -> bool:
+    """Apply one change from another device; return True if it changed anything"""
+    stamp = (int(record["clock"]), record["device"])
+    cursor.execute(
+        "SELECT clock, device FROM sync_tombstones WHERE uuid = ?", (record["uuid"],)
+    )
+    tombstone = cursor.fetchone()
+    if tombstone and not _wins(stamp, tombstone):
+        return False
+
+    cursor.execute(
+        "SELECT id, clock, device FROM activities WHERE uuid = ?", (record["uuid"],)
+    )
+    local = cursor.fetchone()
+    if local and not _wins(stamp, (local[1], local[2])):
+        return False
+
+    if record["op"] == "delete":
+        cursor.execute(
+            "INSERT OR REPLACE INTO sync_tombstones (uuid, clock, device) VALUES (?, ?, ?)",
+            (record["uuid"], *stamp),
+        )
+        if local:
+            cursor.execute("DELETE FROM activities WHERE id = ?", (local[0],))
+        return local is not None
+
+    values = [record.get(field) for field in ROW_FIELDS]
+    if local:
+        cursor.execute(
+            f"""
+            UPDATE activities SET {', '.join(f'{field} = ?' for field in ROW_FIELDS)},
+                clock = ?, device = ?
+            WHERE id = ?
+        """,
+            (*values, *stamp, local[0]),
+        )
+    else:
+        cursor.execute(
+            f"""
+            INSERT INTO activities ({', '.join(ROW_FIELDS)}, uuid, clock, device)
+            VALUES ({', '.join('?' for _ in ROW_FIELDS)}, ?, ?, ?)
+        """,
+            (*values, record["uuid"], *stamp),
+        )
+    return True
+
+
+def _read_new_lines(feed: Path, offset: int) -> Tuple[List[str], int]:
+    """Read complete lines appended to a feed since `offset`"""
+    with open(feed, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1  # leave a partially written last line for later
+    lines = data[:end].decode("utf-8").splitlines()
+    return lines, offset + end
+
+
+def sync(db_path: Path, sync_dir: Path) -> Dict[str, int]:
+    """Exchange changes with every device feed in sync_dir"""
+    sync_dir.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    stats = {"sent": 0, "received": 0, "devices": 0}
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        device_id = enable_sync(cursor)
+        _set(cursor, "sync_dir", str(sync_dir))
+
+        stats["sent"] = _export(cursor, sync_dir / f"{device_id}.jsonl")
+
+        _set(cursor, "applying", 1)
+        clock = int(_get(cursor, "clock", 0))
+        for feed in sorted(sync_dir.glob("*.jsonl")):
+            peer = feed.stem
+            if peer == device_id:
+                continue
+            stats["devices"] += 1
+            offset_key = f"offset:{peer}"
+            lines, offset = _read_new_lines(feed, int(_get(cursor, offset_key, 0)))
+            for line in lines:
+                record = json.loads(line)
+                clock = max(clock, int(record["clock"]))
+                if _apply(cursor, record):
+                    stats["received"] += 1
+            _set(cursor, offset_key, offset)
+        _set(cursor, "clock", clock)
+        _set(cursor, "applying", 0)
+        cursor.execute("COMMIT")
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return stats
+
+
+def last_sync_dir(db_path: Path) -> Optional[Path]:
+    """The folder used by the previous sync, if any"""
+    conn = sqlite3.connect(db_path)
+    try:
+        value = _get(conn.cursor(), "sync_dir")
+    except sqlite3.OperationalError:
+        value = None  # sync never enabled
+    finally:
+        conn.close()
+    return Path(value) if value else None
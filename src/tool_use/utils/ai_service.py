@@ -1,4 +1,4 @@
-from typing import Optional, Type, TypeVar
+from typing import List, Optional, Type, TypeVar
 from anthropic import Anthropic
 from groq import Groq
 import ollama
@@ -16,10 +16,31 @@ class AIService:
         "anthropic": "claude-3-5-sonnet-20241022",
         "openai": "gpt-4-0125-preview",
     }
+    DEFAULT_EMBEDDING_MODELS = {
+        "ollama": "nomic-embed-text",
+        "openai": "text-embedding-3-small",
+    }
+    # Tokens of prompt plus reply each service is used with. Ollama is only
+    # asked for a window (num_ctx) when the caller gives one; otherwise the
+    # model's own default applies.
+    DEFAULT_CONTEXT_WINDOWS = {
+        "ollama": 8192,
+        "groq": 8192,
+        "anthropic": 200000,
+        "openai": 128000,
+    }
 
-    def __init__(self, service_type: Optional[str] = None, model: Optional[str] = None):
+    def __init__(
+        self,
+        service_type: Optional[str] = None,
+        model: Optional[str] = None,
+        context_window: Optional[int] = None,
+    ):
         self.service_type = service_type.lower() if service_type else "ollama"
         self.model = model if model else self.DEFAULT_MODELS[self.service_type]
+        self.context_window = context_window or self.DEFAULT_CONTEXT_WINDOWS[self.service_type]
+        self.num_ctx = context_window  # explicit window for Ollama, or None
+        self.embedding_model = self.DEFAULT_EMBEDDING_MODELS.get(self.service_type)
 
         if self.service_type == "groq":
             self.client = Groq(api_key=config_manager.get_api_key("groq"))
@@ -51,13 +72,29 @@ class AIService:
                 print(f"Error occurred: {e}. Retrying...")
         raise Exception(f"Failed to query {self.service_type} after 3 attempts")
 
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with the service's embedding model (Ollama or OpenAI only)"""
+        if self.service_type == "ollama":
+            if hasattr(self.client, "embed"):
+                response = self.client.embed(model=self.embedding_model, input=texts)
+                return response["embeddings"]
+            return [
+                self.client.embeddings(model=self.embedding_model, prompt=text)["embedding"]
+                for text in texts
+            ]
+        elif self.service_type == "openai":
+            response = self.client.embeddings.create(model=self.embedding_model, input=texts)
+            return [item.embedding for item in response.data]
+        raise ValueError(f"Embeddings are not supported by {self.service_type}")
+
     def _query_ollama(self, prompt: str, system_prompt: Optional[str] = None) -> str:
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
         
-        response = self.client.chat(model=self.model, messages=messages)
+        options = {"num_ctx": self.num_ctx} if self.num_ctx else None
+        response = self.client.chat(model=self.model, messages=messages, options=options)
         return response["message"]["content"]
 
     def _query_groq(self, prompt: str, system_prompt: Optional[str] = None, max_tokens: int = 1024) -> str:
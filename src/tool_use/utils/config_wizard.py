@@ -32,7 +32,23 @@ SCRIPT_INFO = {
             "default_model": {
                 "description": "Default Whisper model to use",
                 "default": "tiny.en",
-            }
+            },
+            "sample_rate": {
+                "description": "Recording sample rate in Hz (Whisper models use 16000)",
+                "default": 16000,
+            },
+            "vad": {
+                "description": "Silence detection before transcription: energy, webrtc, silero or off",
+                "default": "energy",
+            },
+            "cache_size_mb": {
+                "description": "Size limit of the transcript cache in ~/.tool-use/shallowgram",
+                "default": 500,
+            },
+            "context_window": {
+                "description": "Tokens the AI model gets for analysis (Ollama's num_ctx)",
+                "default": 8192,
+            },
         }
     },
     "posture": {
@@ -0,0 +1,251 @@
+"""Idle (away-from-keyboard) detection for `ai log`.
+
+A probe reports how many seconds have passed since the last keyboard or mouse
+input. `IdleMonitor` samples it and records idle intervals in the activity
+database, which `stop_activity` subtracts from the running activity.
+
+Polling is cheap: while the user is active the monitor sleeps until the
+earliest moment they could cross the idle threshold, and since the probe
+reports how long input has been idle, both ends of an interval are exact no
+matter how rarely it polls. The database is written on idle/active
+transitions and, while away, with a heartbeat every HEARTBEAT_INTERVAL
+(not on every poll, so the disk stays quiet): an interval left open by a
+monitor that was killed is taken to end at its last heartbeat. SIGTERM and SIGHUP (logout, shutdown) close the interval cleanly.
+"""
+
+import datetime
+import os
+import re
+import shutil
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+IdleProbe = Callable[[], Optional[float]]
+
+IDLE_THRESHOLD = 5 * 60  # seconds without input before the user counts as away
+POLL_INTERVAL = 30  # seconds between samples while away
+HEARTBEAT_INTERVAL = 5 * 60  # seconds between last_seen writes while away
+# How far past its last heartbeat an open interval may still be running
+HEARTBEAT_GRACE = HEARTBEAT_INTERVAL + POLL_INTERVAL
+MIN_POLL_INTERVAL = 5
+PROBE_TIMEOUT = 2
+
+
+def _run(command: list) -> Optional[str]:
+    try:
+        result = subprocess.run(
+            command, capture_output=True, text=True, timeout=PROBE_TIMEOUT
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+
+def xprintidle_probe() -> Optional[float]:
+    """X11 idle time via the xprintidle utility"""
+    output = _run(["xprintidle"])
+    return int(output) / 1000 if output and output.strip().isdigit() else None
+
+
+def gnome_probe() -> Optional[float]:
+    """GNOME (X11 or Wayland) idle time from Mutter's IdleMonitor"""
+    output = _run(
+        [
+            "gdbus", "call", "--session",
+            "--dest", "org.gnome.Mutter.IdleMonitor",
+            "--object-path", "/org/gnome/Mutter/IdleMonitor/Core",
+            "--method", "org.gnome.Mutter.IdleMonitor.GetIdletime",
+        ]
+    )  # fmt: skip
+    match = re.search(r"(\d+)", output or "")
+    return int(match.group(1)) / 1000 if match else None
+
+
+def macos_probe() -> Optional[float]:
+    """macOS idle time from the HID system (nanoseconds)"""
+    output = _run(["ioreg", "-c", "IOHIDSystem", "-d", "4"])
+    match = re.search(r'"HIDIdleTime" = (\d+)', output or "")
+    return int(match.group(1)) / 1e9 if match else None
+
+
+class FileProbe:
+    """Reads idle time from a file, for tests and custom input hooks.
+    The file holds idle seconds, or if it doesn't parse as a number its
+    modification time is taken as the last input (so `touch` means "active")."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path).expanduser()
+
+    def __call__(self) -> Optional[float]:
+        try:
+            text = self.path.read_text().strip()
+            if text:
+                return max(float(text), 0.0)
+        except ValueError:
+            pass
+        except OSError:
+            return None
+        try:
+            return max(time.time() - self.path.stat().st_mtime, 0.0)
+        except OSError:
+            return None
+
+
+def get_probe(spec: str = "auto") -> Optional[IdleProbe]:
+    """Resolve a probe name ('auto', 'xprintidle', 'gnome', 'macos' or 'file:<path>')"""
+    if spec.startswith("file:"):
+        return FileProbe(Path(spec[len("file:"):]))
+    probes = {"xprintidle": xprintidle_probe, "gnome": gnome_probe, "macos": macos_probe}
+    if spec != "auto":
+        if spec not in probes:
+            raise ValueError(
+                f"Unknown idle probe '{spec}'. Use auto, {', '.join(probes)} or file:<path>"
+            )
+        return probes[spec]
+
+    candidates = []
+    if sys.platform == "darwin":
+        candidates.append(macos_probe)
+    else:
+        if os.environ.get("DISPLAY") and shutil.which("xprintidle"):
+            candidates.append(xprintidle_probe)
+        if shutil.which("gdbus"):
+            candidates.append(gnome_probe)
+    for probe in candidates:
+        if probe() is not None:
+            return probe
+    return None
+
+
+class IdleMonitor:
+    """Samples an idle probe and records idle intervals in the activity database"""
+
+    def __init__(
+        self,
+        db_path: Path,
+        probe: IdleProbe,
+        threshold: float = IDLE_THRESHOLD,
+        poll_interval: float = POLL_INTERVAL,
+    ):
+        self.db_path = db_path
+        self.probe = probe
+        self.threshold = threshold
+        self.poll_interval = poll_interval
+        self.idle_since: Optional[float] = None  # start of the open interval
+        self.last_idle_sample: Optional[float] = None
+        self.last_heartbeat = 0.0  # when last_seen was last written
+
+    def _write(self, statements: list) -> None:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                for sql, params in statements:
+                    conn.execute(sql, params)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _ts(epoch: float) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(epoch)
+
+    def _close(self, end: float) -> tuple:
+        return (
+            "UPDATE idle_intervals SET end_time = ? WHERE start_time = ? AND end_time IS NULL",
+            (self._ts(max(end, self.idle_since)), self._ts(self.idle_since)),
+        )
+
+    def _open(self, start: float, now: float) -> tuple:
+        return (
+            """
+            INSERT OR REPLACE INTO idle_intervals (start_time, end_time, last_seen)
+            VALUES (?, NULL, ?)
+        """,
+            (self._ts(start), self._ts(now)),
+        )
+
+    def _heartbeat(self, now: float) -> tuple:
+        return (
+            "UPDATE idle_intervals SET last_seen = ? WHERE start_time = ? AND end_time IS NULL",
+            (self._ts(now), self._ts(self.idle_since)),
+        )
+
+    def recover(self) -> None:
+        """Close intervals left open by a monitor that didn't shut down cleanly
+        They end at the last heartbeat; without one their end is unknown and
+        they're dropped."""
+        self._write(
+            [
+                (
+                    """
+                    UPDATE idle_intervals SET end_time = last_seen
+                    WHERE end_time IS NULL AND last_seen IS NOT NULL
+                """,
+                    (),
+                ),
+                ("DELETE FROM idle_intervals WHERE end_time IS NULL", ()),
+            ]
+        )
+
+    def poll(self, now: Optional[float] = None) -> float:
+        """Take one sample, record any transition, return seconds until the next sample"""
+        now = time.time() if now is None else now
+        idle = self.probe()
+        if idle is None:
+            return self.poll_interval
+
+        statements = []
+        last_input = now - idle
+        if idle >= self.threshold:
+            if self.idle_since is not None and last_input > self.last_idle_sample:
+                # There was input since the last sample and the user went
+                # away again: close the old interval where we last saw it
+                statements.append(self._close(self.last_idle_sample))
+                self.idle_since = None
+            if self.idle_since is None:
+                self.idle_since = last_input
+                statements.append(self._open(last_input, now))
+                self.last_heartbeat = now
+            elif now - self.last_heartbeat >= HEARTBEAT_INTERVAL:
+                statements.append(self._heartbeat(now))
+                self.last_heartbeat = now
+            self.last_idle_sample = now
+            delay = self.poll_interval
+        else:
+            if self.idle_since is not None:
+                statements.append(self._close(last_input))
+                self.idle_since = None
+            # Nobody can go idle before the threshold is reached
+            delay = max(self.threshold - idle, MIN_POLL_INTERVAL)
+
+        if statements:
+            self._write(statements)
+        return delay
+
+    def shutdown(self, now: Optional[float] = None) -> None:
+        """Close the open interval (if any) at the current time"""
+        if self.idle_since is not None:
+            self._write([self._close(time.time() if now is None else now)])
+            self.idle_since = None
+
+    def run(self, stop_event: Optional[threading.Event] = None) -> None:
+        """Poll until stop_event is set (or forever), then close any open interval"""
+        stop_event = stop_event or threading.Event()
+        previous = {}
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, getattr(signal, "SIGHUP", None)):
+                if signum is not None:
+                    previous[signum] = signal.signal(signum, lambda *_: stop_event.set())
+        self.recover()
+        try:
+            while not stop_event.is_set():
+                stop_event.wait(self.poll(time.time()))
+        finally:
+            self.shutdown()
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
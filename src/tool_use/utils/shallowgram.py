@@ -1,8 +1,21 @@
 #!/usr/bin/env python
 import argparse
+import atexit
+import bisect
+import json
+import re
+import socket
 import subprocess
 import os
+import queue
+import tempfile
+import threading
 import time
+import uuid
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 import pyaudio
 import wave
 from pydub import AudioSegment
@@ -12,10 +25,12 @@ from rich.panel import Panel
 from rich.text import Text
 from rich.table import Table
 from rich import box
-import select
 import sys
+from pydantic import BaseModel, Field, ValidationError
 from ..utils.ai_service import AIService
-from urllib.request import urlretrieve
+from .transcript_cache import CACHE_MAX_BYTES, TranscriptCache, cache_key, file_hash
+from urllib.error import URLError
+from urllib.request import Request, urlopen, urlretrieve
 
 console = Console()
 
@@ -26,7 +41,55 @@ WHISPER_BASE_URL = "https://huggingface.co/Mozilla/whisperfile/resolve/main/"
 CHUNK = 1024
 FORMAT = pyaudio.paInt16
 CHANNELS = 1
-RATE = 44100
+RATE = 16000  # whisper models consume 16 kHz mono, so capture at that rate
+FLUSH_INTERVAL = 1.0  # seconds between fsyncs of the recording
+DEFAULT_VAULT_PATH = os.path.expanduser("~/Documents/ObsidianVault")
+
+# Voice activity detection
+VAD_BACKENDS = ("energy", "webrtc", "silero")
+VAD_FRAME_MS = 30
+MIN_SPEECH_RMS = 300  # 16-bit RMS below which a frame is never speech
+MAX_SPEECH_RMS = 2000  # ...and above which it always is, however long the talking
+SPEECH_FACTOR = 3.0  # speech is at least this many times louder than the noise floor
+NOISE_WINDOW = 30.0  # seconds of recent audio used to estimate the noise floor
+VAD_PADDING = 0.25  # seconds of silence kept on each side of speech
+VAD_BLOCK = 60.0  # seconds of a file classified at a time
+VAD_MIN_SAVING = 1.0  # seconds of silence worth re-encoding the audio for
+WEBRTC_AGGRESSIVENESS = 2  # 0 (keeps most) to 3 (drops most)
+
+# Streaming transcription while recording
+STREAM_MIN_CHUNK = 5.0  # seconds of audio before a chunk may be cut at a pause
+STREAM_MAX_CHUNK = 30.0  # whisper's window; cut here even without a pause
+STREAM_MIN_PAUSE = 0.4  # seconds of silence that make a chunk boundary
+CHUNK_OVERLAP = 1.0  # seconds repeated in the next chunk after a forced cut
+
+# Long files are transcribed in chunks, in parallel with several workers
+PARALLEL_CHUNK = 300.0  # seconds of audio per job
+PARALLEL_MIN_DURATION = 2 * PARALLEL_CHUNK  # shorter files go in one piece
+THREADS_PER_WORKER = 4  # whisper.cpp gains little from more threads per process
+MAX_WORKERS = 8  # every worker holds its own copy of the model in memory
+
+# Analysis of transcripts longer than the model's context. The budgets are
+# capped by the AI service's context window, which Ollama is asked for as
+# num_ctx (its own default of 2048 tokens would cut off long prompts), less
+# room for the instructions and the reply.
+CONTEXT_WINDOW = 8192  # tokens, unless configured
+CHARS_PER_TOKEN = 4  # rough, and on the safe side for English
+ANALYSIS_TOKEN_BUDGET = 6000  # longer text is condensed chunk by chunk first
+SUMMARY_CHUNK_TOKENS = ANALYSIS_TOKEN_BUDGET // 2
+RESPONSE_TOKENS = 1024  # of the context window, kept for the prompt and the reply
+SUMMARY_WORKERS = 4
+BOUNDARY_EVERY = 8  # average lines between content-defined chunk boundaries
+
+SERVER_HOST = "127.0.0.1"
+SERVER_STARTUP_TIMEOUT = 120  # seconds to wait for the model to load
+SERVER_IDLE_TIMEOUT = 300  # shut the server down after this long unused
+SERVER_REQUEST_TIMEOUT = 3600  # seconds without a reply; long files go in chunks
+UPLOAD_BLOCK_SIZE = 1 << 20  # bytes of audio read at a time while uploading
+
+TIMESTAMP_LINE = re.compile(
+    r"^\[(\d+):(\d+):(\d+(?:\.\d+)?) --> (\d+):(\d+):(\d+(?:\.\d+)?)\]\s*(.*)$"
+)
 
 ASCII_ART = """
   ____  _           _ _                                        
@@ -77,50 +140,78 @@ def get_whisper_model_path(model_name, whisperfile_path, verbose):
             raise FileNotFoundError(f"Whisper model {full_model_name} not found.")
     return model_path
 
-def record_audio(output_file, verbose=False):
+def _write_frames(frames, wf, out, on_audio=None):
+    """Drain recorded chunks into the WAV until the None sentinel arrives"""
+    last_flush = time.monotonic()
+    while True:
+        data = frames.get()
+        if data is None:
+            break
+        # writeframes also patches the header, so the file is always playable
+        wf.writeframes(data)
+        if on_audio:
+            on_audio(data)
+        if time.monotonic() - last_flush >= FLUSH_INTERVAL:
+            out.flush()
+            os.fsync(out.fileno())
+            last_flush = time.monotonic()
+
+def record_audio(output_file, verbose=False, rate=RATE, on_audio=None):
     p = pyaudio.PyAudio()
 
+    out = open(output_file, "wb")
+    wf = wave.open(out, "wb")
+    wf.setnchannels(CHANNELS)
+    wf.setsampwidth(p.get_sample_size(FORMAT))
+    wf.setframerate(rate)
+
+    # PyAudio calls back from its own thread; chunks are handed to a writer
+    # thread so memory stays flat and audio is on disk as it's captured
+    frames = queue.Queue()
+    writer = threading.Thread(
+        target=_write_frames, args=(frames, wf, out, on_audio), daemon=True
+    )
+    writer.start()
+
+    def callback(in_data, frame_count, time_info, status):
+        frames.put(in_data)
+        return (None, pyaudio.paContinue)
+
     stream = p.open(
         format=FORMAT,
         channels=CHANNELS,
-        rate=RATE,
+        rate=rate,
         input=True,
-        frames_per_buffer=CHUNK
+        frames_per_buffer=CHUNK,
+        stream_callback=callback,
     )
 
     console.print("[yellow]Recording... Press Enter to stop.[/yellow]")
 
-    frames = []
-
     try:
-        while True:
-            if select.select([sys.stdin], [], [], 0.0)[0]:
-                if sys.stdin.readline().strip() == "":
-                    break
-            data = stream.read(CHUNK)
-            frames.append(data)
+        stream.start_stream()
+        sys.stdin.readline()
     except KeyboardInterrupt:
         pass
+    finally:
+        stream.stop_stream()
+        stream.close()
+        p.terminate()
+        frames.put(None)
+        writer.join()
+        wf.close()
+        out.close()
 
     console.print("[green]Finished recording.[/green]")
 
-    stream.stop_stream()
-    stream.close()
-    p.terminate()
-
-    wf = wave.open(output_file, "wb")
-    wf.setnchannels(CHANNELS)
-    wf.setsampwidth(p.get_sample_size(FORMAT))
-    wf.setframerate(RATE)
-    wf.writeframes(b"".join(frames))
-    wf.close()
-
     if verbose:
         console.print(f"[yellow]Audio file size: {os.path.getsize(output_file)} bytes[/yellow]")
 
-def transcribe_audio(model_name, whisperfile_path, audio_file, verbose):
+def transcribe_audio(model_name, whisperfile_path, audio_file, verbose, threads=None):
     model_path = get_whisper_model_path(model_name, whisperfile_path, verbose)
     command = f"{model_path} -f {audio_file} --gpu auto"
+    if threads:
+        command += f" --threads {threads}"
 
     if verbose:
         console.print(f"[yellow]Attempting to run command: {command}[/yellow]")
@@ -141,27 +232,645 @@ def transcribe_audio(model_name, whisperfile_path, audio_file, verbose):
 
     return stdout
 
-def summarize(text):
-    ai_service = AIService()
+def _seconds(hours, minutes, seconds):
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+def _timestamp(seconds):
+    hours, rest = divmod(max(seconds, 0), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}"
+
+def parse_transcript(transcript):
+    """Split whisper output into (start, end, text) segments"""
+    segments = []
+    for line in transcript.splitlines():
+        match = TIMESTAMP_LINE.match(line.strip())
+        if match:
+            start = _seconds(*match.group(1, 2, 3))
+            end = _seconds(*match.group(4, 5, 6))
+            segments.append((start, end, match.group(7).strip()))
+        elif line.strip():
+            segments.append((None, None, line.strip()))
+    return segments
+
+def format_transcript(segments):
+    """Render segments the way the whisper command line prints them"""
+    lines = []
+    for start, end, text in segments:
+        if start is None:
+            lines.append(text)
+        else:
+            lines.append(f"[{_timestamp(start)} --> {_timestamp(end)}]  {text}")
+    return "\n".join(lines) + "\n"
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind((SERVER_HOST, 0))
+        return sock.getsockname()[1]
+
+def _multipart(fields, file_field, file_path):
+    """Multipart form body as (blocks, length, content type)
+    The file is read block by block while the body is sent, not loaded whole."""
+    boundary = uuid.uuid4().hex
+    head = "".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+        for name, value in fields.items()
+    )
+    head += (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+        f'filename="{os.path.basename(file_path)}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    )
+    head, tail = head.encode(), f"\r\n--{boundary}--\r\n".encode()
+
+    def blocks():
+        yield head
+        with open(file_path, "rb") as f:
+            yield from iter(lambda: f.read(UPLOAD_BLOCK_SIZE), b"")
+        yield tail
+
+    length = len(head) + os.path.getsize(file_path) + len(tail)
+    return blocks(), length, f"multipart/form-data; boundary={boundary}"
+
+class WhisperServer:
+    """A whisperfile running in server mode, so the model is loaded once.
+
+    Started on first use, health-checked before each request, restarted if
+    it died, and shut down after SERVER_IDLE_TIMEOUT seconds without work.
+    """
+
+    def __init__(self, model_path, idle_timeout=SERVER_IDLE_TIMEOUT, verbose=False, threads=None):
+        self.model_path = model_path
+        self.threads = threads
+        self.idle_timeout = idle_timeout
+        self.verbose = verbose
+        self.port = None
+        self.process = None
+        self.log_file = None
+        self.last_used = 0.0
+        self._lock = threading.RLock()
+        self._idle_timer = None
+        atexit.register(self.stop)
+
+    @property
+    def url(self):
+        return f"http://{SERVER_HOST}:{self.port}"
+
+    def healthy(self):
+        if self.process is None or self.process.poll() is not None:
+            return False
+        try:
+            with urlopen(self.url + "/", timeout=2) as response:
+                return response.status == 200
+        except (URLError, OSError):
+            return False
+
+    def start(self):
+        self.stop()
+        self.port = _free_port()
+        self.log_file = tempfile.TemporaryFile()
+        command = [
+            self.model_path, "--server",
+            "--host", SERVER_HOST, "--port", str(self.port),
+            "--gpu", "auto",
+        ]
+        if self.threads:
+            command += ["--threads", str(self.threads)]
+        if self.verbose:
+            console.print(f"[yellow]Starting whisper server: {' '.join(command)}[/yellow]")
+        try:
+            self.process = subprocess.Popen(
+                command, stdout=self.log_file, stderr=subprocess.STDOUT
+            )
+        except OSError:
+            # Some systems can't exec the polyglot llamafile directly
+            self.process = subprocess.Popen(
+                ["sh"] + command, stdout=self.log_file, stderr=subprocess.STDOUT
+            )
+
+        deadline = time.monotonic() + SERVER_STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            if self.healthy():
+                return
+            time.sleep(0.25)
+        output = self._log_tail()
+        self.stop()
+        raise RuntimeError(f"Whisper server failed to start: {output}")
+
+    def _log_tail(self):
+        if self.log_file is None:
+            return ""
+        self.log_file.seek(0)
+        return self.log_file.read().decode(errors="replace")[-2000:]
+
+    def stop(self):
+        with self._lock:
+            if self._idle_timer:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            if self.process and self.process.poll() is None:
+                self.process.terminate()
+                try:
+                    self.process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+                    self.process.wait()
+            self.process = None
+            if self.log_file:
+                self.log_file.close()
+                self.log_file = None
+
+    def _schedule_idle_shutdown(self):
+        if self._idle_timer:
+            self._idle_timer.cancel()
+        self._idle_timer = threading.Timer(self.idle_timeout, self._stop_if_idle)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def _stop_if_idle(self):
+        with self._lock:
+            if time.monotonic() - self.last_used >= self.idle_timeout:
+                self.stop()
+
+    def transcribe(self, audio_file):
+        """Transcribe a WAV file; returns whisper-style timestamped text"""
+        with self._lock:
+            if not self.healthy():
+                self.start()
+            body, length, content_type = _multipart(
+                {"response_format": "verbose_json", "temperature": "0.0"},
+                "file",
+                audio_file,
+            )
+            request = Request(
+                self.url + "/inference",
+                data=body,
+                headers={"Content-Type": content_type, "Content-Length": str(length)},
+            )
+            try:
+                with urlopen(request, timeout=SERVER_REQUEST_TIMEOUT) as response:
+                    payload = json.loads(response.read().decode("utf-8"))
+            finally:
+                self.last_used = time.monotonic()
+                self._schedule_idle_shutdown()
+
+        if "error" in payload:
+            raise Exception(f"Transcription failed: {payload['error']}")
+        segments = [
+            (segment["start"], segment["end"], segment["text"].strip())
+            for segment in payload.get("segments") or []
+        ]
+        if not segments:
+            segments = [(None, None, payload.get("text", "").strip())]
+        return format_transcript(segments)
+
+def frame_energies(samples, rate, frame_ms=VAD_FRAME_MS):
+    """RMS energy of each complete frame of 16-bit mono samples"""
+    frame = int(rate * frame_ms / 1000)
+    count = len(samples) // frame
+    frames = samples[: count * frame].astype(np.float32).reshape(count, frame)
+    return np.sqrt((frames ** 2).mean(axis=1))
+
+def speech_threshold(energies):
+    """Energy above which a frame counts as speech, relative to the noise floor"""
+    if len(energies) == 0:
+        return MIN_SPEECH_RMS
+    floor = float(np.percentile(energies, 10))
+    return min(max(MIN_SPEECH_RMS, floor * SPEECH_FACTOR), MAX_SPEECH_RMS)
+
+def write_wav(path, samples, rate):
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(CHANNELS)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(samples.astype("<i2").tobytes())
+
+def _require_webrtcvad():
+    try:
+        import webrtcvad
+    except ImportError:
+        raise RuntimeError(
+            "WebRTC VAD requires webrtcvad. Install it with: pip install webrtcvad"
+        )
+    return webrtcvad
+
+_silero_model = None
+
+def _require_silero():
+    global _silero_model
+    try:
+        import torch
+        from silero_vad import get_speech_timestamps, load_silero_vad
+    except ImportError:
+        raise RuntimeError(
+            "Silero VAD requires silero-vad. Install it with: pip install silero-vad"
+        )
+    if _silero_model is None:
+        _silero_model = load_silero_vad()
+    return torch, get_speech_timestamps, _silero_model
+
+def speech_mask(samples, rate, backend="energy"):
+    """Whether each VAD_FRAME_MS frame of 16-bit mono samples contains speech"""
+    frame = int(rate * VAD_FRAME_MS / 1000)
+    count = len(samples) // frame
+    if backend == "energy":
+        energies = frame_energies(samples, rate)
+        return energies >= speech_threshold(energies)
+    if backend == "webrtc":
+        vad = _require_webrtcvad().Vad(WEBRTC_AGGRESSIVENESS)
+        data = samples.astype("<i2").tobytes()
+        return np.array(
+            [vad.is_speech(data[i * frame * 2:(i + 1) * frame * 2], rate) for i in range(count)],
+            dtype=bool,
+        )
+    if backend == "silero":
+        torch, get_speech_timestamps, model = _require_silero()
+        audio = torch.from_numpy(samples.astype(np.float32) / 32768)
+        mask = np.zeros(count, dtype=bool)
+        for speech in get_speech_timestamps(audio, model, sampling_rate=rate):
+            mask[speech["start"] // frame:-(-speech["end"] // frame)] = True
+        return mask
+    raise ValueError(f"Unknown VAD backend '{backend}'. Use one of: {', '.join(VAD_BACKENDS)}")
+
+def speech_regions(mask, rate, total):
+    """(start, end) sample ranges of speech, padded with VAD_PADDING
+    Regions whose padding touches are merged, so pauses up to twice the
+    padding are kept as they are and longer ones shrink to that length."""
+    frame = int(rate * VAD_FRAME_MS / 1000)
+    pad = int(VAD_PADDING * rate)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    regions = []
+    for first, last in zip(edges[::2], edges[1::2]):
+        start = max(int(first) * frame - pad, 0)
+        end = min(int(last) * frame + pad, total)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+def detect_speech(audio_file, backend="energy"):
+    """Speech regions of a 16-bit mono WAV, read a block at a time
+    Returns (regions, sample rate, total samples)."""
+    with wave.open(audio_file, "rb") as wf:
+        rate, total = wf.getframerate(), wf.getnframes()
+        frame = int(rate * VAD_FRAME_MS / 1000)
+        block = frame * int(VAD_BLOCK * 1000 / VAD_FRAME_MS)
+        masks = []
+        while True:
+            data = wf.readframes(block)
+            if not data:
+                break
+            masks.append(speech_mask(np.frombuffer(data, dtype="<i2"), rate, backend))
+    mask = np.concatenate(masks) if masks else np.zeros(0, dtype=bool)
+    return speech_regions(mask, rate, total), rate, total
+
+def write_regions(audio_file, output_file, regions):
+    """Copy the given sample ranges of a WAV, back to back, into a new WAV"""
+    block = CHUNK * 64
+    with wave.open(audio_file, "rb") as src, wave.open(output_file, "wb") as dst:
+        dst.setparams(src.getparams())
+        width = src.getsampwidth() * src.getnchannels()
+        for start, end in regions:
+            src.setpos(start)
+            remaining = end - start
+            while remaining > 0:
+                data = src.readframes(min(remaining, block))
+                if not data:
+                    break
+                dst.writeframes(data)
+                remaining -= len(data) // width
+
+class TimeMap:
+    """Maps times in silence-compressed audio back to the original audio"""
+
+    def __init__(self, regions, rate):
+        self.regions = [(start / rate, end / rate) for start, end in regions]
+        self.starts = []  # where each region begins in the compressed audio
+        position = 0.0
+        for start, end in self.regions:
+            self.starts.append(position)
+            position += end - start
+
+    def original(self, t, end=False):
+        # A segment ending where a region ends belongs to that region, not the next
+        find = bisect.bisect_left if end else bisect.bisect_right
+        i = max(find(self.starts, t) - 1, 0)
+        start, stop = self.regions[i]
+        return min(start + t - self.starts[i], stop)
+
+    def remap(self, segments):
+        return [
+            (start, end, text)
+            if start is None
+            else (self.original(start), self.original(end, end=True), text)
+            for start, end, text in segments
+        ]
+
+def default_workers():
+    """Parallel transcription workers for this machine"""
+    return max(1, min((os.cpu_count() or 1) // THREADS_PER_WORKER, MAX_WORKERS))
+
+def pause_points(regions):
+    """Sample positions halfway between consecutive speech regions"""
+    return [(end + start) // 2 for (_, end), (start, _) in zip(regions, regions[1:])]
+
+def plan_chunks(total, rate, pauses, target=PARALLEL_CHUNK, overlap=CHUNK_OVERLAP):
+    """Split total samples into (start, end, overlap) chunks of about target seconds
+    Each cut is made at the last pause before the target length, or else the
+    first one after it. With no pause within half a chunk either way the cut
+    is made anyway and the next chunk repeats `overlap` seconds (the third
+    value, in samples), so words on the boundary aren't lost."""
+    size = int(target * rate)
+    chunks = []
+    start = lead = 0
+    while total - start > size * 3 // 2:
+        want = start + size
+        i = bisect.bisect_right(pauses, want)
+        if i and pauses[i - 1] > start + size // 2:
+            cut = next_start = pauses[i - 1]
+        elif i < len(pauses) and pauses[i] < want + size // 2:
+            cut = next_start = pauses[i]
+        else:
+            cut, next_start = want, want - int(overlap * rate)
+        chunks.append((start, cut, lead))
+        lead = cut - next_start
+        start = next_start
+    chunks.append((start, total, lead))
+    return chunks
+
+def merge_segments(merged, segments, offset, overlap=0.0):
+    """Append a chunk's segments to merged, shifted by the chunk's offset
+    The chunk's first `overlap` seconds repeat the end of the previous chunk.
+    Segments ending inside them were already transcribed there and are
+    dropped; segments of the previous chunk that start after this chunk's
+    first kept one are superseded by it. Returns the segments that were added."""
+    added = []
+    for start, end, text in segments:
+        if not text or (end is not None and end <= overlap):
+            continue
+        if start is not None:
+            start, end = start + offset, end + offset
+        added.append((start, end, text))
+    if overlap and added and added[0][0] is not None:
+        while merged and merged[-1][0] is not None and merged[-1][0] >= added[0][0]:
+            merged.pop()
+    merged.extend(added)
+    return added
+
+class StreamChunker:
+    """Cuts a live 16-bit mono stream into chunks at pauses in speech.
+
+    Once STREAM_MIN_CHUNK seconds are buffered, the buffer is cut in the
+    middle of its last pause. Without a pause they're cut at STREAM_MAX_CHUNK and the next
+    chunk repeats the last CHUNK_OVERLAP seconds. on_chunk receives
+    (samples, offset, overlap) with times in seconds from the stream start;
+    chunks without any speech are dropped.
+    """
+
+    def __init__(self, rate, on_chunk):
+        self.rate = rate
+        self.on_chunk = on_chunk
+        self.frame = int(rate * VAD_FRAME_MS / 1000)
+        self.buffer = np.zeros(0, dtype=np.int16)
+        self.energies = []  # per complete frame of the buffer
+        self.noise = deque(maxlen=int(NOISE_WINDOW * 1000 / VAD_FRAME_MS))
+        self.offset = 0.0  # stream time of buffer[0]
+        self.overlap = 0.0  # leading seconds of the buffer already transcribed
+        self.pause_frames = int(STREAM_MIN_PAUSE * 1000 / VAD_FRAME_MS)
+
+    def feed(self, data):
+        self.buffer = np.concatenate((self.buffer, np.frombuffer(data, dtype=np.int16)))
+        done = len(self.energies) * self.frame
+        new = frame_energies(self.buffer[done:], self.rate)
+        self.energies.extend(new)
+        self.noise.extend(new)
+
+        duration = len(self.buffer) / self.rate
+        if duration < STREAM_MIN_CHUNK:
+            return
+        threshold = speech_threshold(np.fromiter(self.noise, dtype=np.float32))
+        pause = self._last_pause(threshold)
+        if pause is not None:
+            self._emit(pause * self.frame, 0, threshold)
+        elif duration >= STREAM_MAX_CHUNK:
+            self._emit(len(self.buffer), int(CHUNK_OVERLAP * self.rate), threshold)
+
+    def _last_pause(self, threshold):
+        """Frame in the middle of the last pause that follows speech, or None"""
+        silent = 0
+        for i in range(len(self.energies) - 1, -1, -1):
+            if self.energies[i] < threshold:
+                silent += 1
+                continue
+            if silent >= self.pause_frames:
+                return i + 1 + silent // 2
+            silent = 0
+        return None
+
+    def _emit(self, cut, overlap, threshold):
+        chunk = self.buffer[:cut]
+        frames = cut // self.frame
+        if any(energy >= threshold for energy in self.energies[:frames]):
+            self.on_chunk(chunk, self.offset, self.overlap)
+        keep = cut - overlap
+        self.buffer = self.buffer[keep:]
+        self.energies = list(frame_energies(self.buffer, self.rate))
+        self.offset += keep / self.rate
+        self.overlap = overlap / self.rate
+
+    def finish(self):
+        """Emit whatever is left once recording stops"""
+        if len(self.buffer) >= self.frame:
+            threshold = speech_threshold(np.fromiter(self.noise, dtype=np.float32))
+            self._emit(len(self.buffer), 0, threshold)
+
+class StreamingTranscriber:
+    """Transcribes chunks in a background worker while recording continues"""
+
+    def __init__(self, transcribe_file, rate, on_segments=None):
+        self.transcribe_file = transcribe_file
+        self.rate = rate
+        self.on_segments = on_segments
+        self.segments = []
+        self.failed = False
+        self.chunks = queue.Queue()
+        self.chunker = StreamChunker(rate, lambda *chunk: self.chunks.put(chunk))
+        self.worker = threading.Thread(target=self._work, daemon=True)
+        self.worker.start()
+
+    def feed(self, data):
+        self.chunker.feed(data)
+
+    def _work(self):
+        while True:
+            item = self.chunks.get()
+            if item is None:
+                break
+            samples, offset, overlap = item
+            fd, path = tempfile.mkstemp(suffix=".wav", prefix="shallowgram-chunk-")
+            os.close(fd)
+            try:
+                write_wav(path, samples, self.rate)
+                segments = parse_transcript(self.transcribe_file(path))
+                added = merge_segments(self.segments, segments, offset, overlap)
+                if added and self.on_segments:
+                    self.on_segments(added)
+            except Exception as e:
+                self.failed = True
+                console.print(f"[red]Chunk at {_timestamp(offset)} failed: {e}[/red]")
+            finally:
+                os.remove(path)
+
+    def finish(self):
+        """Transcribe the remaining audio and return the full transcript"""
+        self.chunker.finish()
+        self.chunks.put(None)
+        self.worker.join()
+        return format_transcript(self.segments)
+
+SENTIMENTS = ["positive", "neutral", "negative"]
+
+class TranscriptAnalysis(BaseModel):
+    """Everything --full reports about a transcript, from a single request"""
+    summary: str = Field(description="Summary of the text, no preamble")
+    sentiment: str = Field(description="Exactly one of 'positive', 'neutral' or 'negative'")
+    intent: str = Field(description="The speaker's intent in 2-4 words")
+    topics: str = Field(description="The main topics as a comma-separated list")
+
+def _normalize_sentiment(sentiment):
+    sentiment = sentiment.strip().lower()
+    return sentiment if sentiment in SENTIMENTS else "neutral"
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def analysis_budget(ai_service):
+    """Tokens of text one analysis prompt may carry on this AI service"""
+    budget = min(ANALYSIS_TOKEN_BUDGET, ai_service.context_window - RESPONSE_TOKENS)
+    return max(budget, RESPONSE_TOKENS // 4)  # tiny windows still get some text
+
+def transcript_text(transcript):
+    """The spoken text of a transcript, without timestamps"""
+    return "\n".join(text for _, _, text in parse_transcript(transcript))
+
+def _lines(text, limit):
+    for line in text.splitlines():
+        while len(line) > limit:
+            cut = line.rfind(" ", 0, limit)
+            cut = cut if cut > 0 else limit
+            yield line[:cut]
+            line = line[cut:].lstrip()
+        if line.strip():
+            yield line
+
+def split_text(text, max_tokens=SUMMARY_CHUNK_TOKENS):
+    """Split text at line breaks into chunks of at most max_tokens
+    Past half the budget a chunk ends after any line whose hash marks it as
+    a boundary, so boundaries follow the content rather than positions: text
+    added or removed somewhere only changes the chunks around it, and the
+    summaries of the others are still in the cache."""
+    limit = max_tokens * CHARS_PER_TOKEN
+    chunks, current, size = [], [], 0
+    for line in _lines(text, limit):
+        if current and size + len(line) + 1 > limit:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+        if size >= limit // 2 and zlib.crc32(line.encode("utf-8")) % BOUNDARY_EVERY == 0:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+def summarize_chunk(chunk, ai_service=None, cache=None):
+    """Summary of one part of a long text, cached by the chunk's content"""
+    ai_service = ai_service or AIService(context_window=CONTEXT_WINDOW)
+    prompt = f"The following is one part of a longer transcript. Summarize it, keeping every task, decision, name and number mentioned. Just provide the summary, no preamble. Text:\n\n{chunk}"
+    key = cache_key("chunk-summary", ai_service.service_type, ai_service.model, prompt)
+    summary = cache.get(key) if cache else None
+    if summary is None:
+        summary = ai_service.query(prompt)
+        if cache:
+            cache.put("summary", key, summary)
+    return summary
+
+def condense(text, ai_service=None, cache=None):
+    """Text that fits the service's analysis_budget: the text itself if it
+    already does, else the summaries of its chunks, summarized again until
+    they fit"""
+    ai_service = ai_service or AIService(context_window=CONTEXT_WINDOW)
+    budget = analysis_budget(ai_service)
+    while estimate_tokens(text) > budget:
+        chunks = split_text(text, min(SUMMARY_CHUNK_TOKENS, budget // 2))
+        with ThreadPoolExecutor(min(SUMMARY_WORKERS, len(chunks))) as pool:
+            summaries = list(
+                pool.map(lambda chunk: summarize_chunk(chunk, ai_service, cache), chunks)
+            )
+        condensed = "\n\n".join(summaries)
+        if len(condensed) >= len(text):
+            break  # the model isn't shortening anything, so stop here
+        text = condensed
+    return text
+
+def summarize(text, ai_service=None, cache=None):
+    ai_service = ai_service or AIService(context_window=CONTEXT_WINDOW)
+    text = condense(text, ai_service, cache)
     prompt = f"Summarize the following text. Just provide the summary, no preamble. Text:\n\n{text}"
     return ai_service.query(prompt)
 
-def analyze_sentiment(text):
-    ai_service = AIService()
+def analyze_sentiment(text, ai_service=None, cache=None):
+    ai_service = ai_service or AIService(context_window=CONTEXT_WINDOW)
+    text = condense(text, ai_service, cache)
     prompt = f"Analyze the sentiment of the following text and respond with ONLY ONE WORD - either 'positive', 'neutral', or 'negative':\n\n{text}"
-    sentiment = ai_service.query(prompt).strip().lower()
-    return sentiment if sentiment in ["positive", "neutral", "negative"] else "neutral"
+    return _normalize_sentiment(ai_service.query(prompt))
 
-def detect_intent(text):
-    ai_service = AIService()
+def detect_intent(text, ai_service=None, cache=None):
+    ai_service = ai_service or AIService(context_window=CONTEXT_WINDOW)
+    text = condense(text, ai_service, cache)
     prompt = f"Detect the intent in the following text. Respond with ONLY 2-4 words. Do not return any preamble, only the intent. Text: \n\n{text}"
     return ai_service.query(prompt)
 
-def detect_topics(text):
-    ai_service = AIService()
+def detect_topics(text, ai_service=None, cache=None):
+    ai_service = ai_service or AIService(context_window=CONTEXT_WINDOW)
+    text = condense(text, ai_service, cache)
     prompt = f"Please identify the main topics in the following text. Return the topics as a comma-separated list, with no preamble or additional text. Text:\n\n{text}"
     return ai_service.query(prompt)
 
+def analyze_structured(text, ai_service=None, cache=None):
+    """Summary, sentiment, intent and topics in one request
+    OpenAI gets a schema-constrained response; other services are asked for
+    JSON. Returns None if the reply can't be parsed."""
+    ai_service = ai_service or AIService(context_window=CONTEXT_WINDOW)
+    text = condense(text, ai_service, cache)
+    if ai_service.service_type == "openai":
+        result = ai_service.query_structured(
+            f"Analyze the following text:\n\n{text}",
+            TranscriptAnalysis,
+            "You summarize and analyze transcripts.",
+        )
+        if not isinstance(result, TranscriptAnalysis):
+            return None  # a refusal
+    else:
+        fields = json.dumps(
+            {name: field.description for name, field in TranscriptAnalysis.model_fields.items()}
+        )
+        prompt = (
+            f"Analyze the following text. Respond with ONLY a JSON object with these keys: {fields}"
+            f"\n\nText:\n\n{text}"
+        )
+        reply = ai_service.query(prompt)
+        try:
+            result = TranscriptAnalysis.model_validate_json(reply[reply.find("{"):reply.rfind("}") + 1])
+        except ValidationError:
+            return None
+    result.sentiment = _normalize_sentiment(result.sentiment)
+    return result.model_dump()
+
 def export_to_markdown(content, vault_path, filename):
     os.makedirs(vault_path, exist_ok=True)
     file_path = os.path.join(vault_path, f"{filename}.md")
@@ -169,9 +878,32 @@ def export_to_markdown(content, vault_path, filename):
         f.write(content)
     console.print(f"[green]Exported to {file_path}[/green]")
 
-def convert_to_wav(input_file, output_file):
-    audio = AudioSegment.from_file(input_file)
-    audio.export(output_file, format="wav")
+def needs_conversion(audio_file, rate=RATE):
+    """True unless the file is already 16-bit mono PCM WAV at `rate`"""
+    if os.path.splitext(audio_file)[1].lower() != ".wav":
+        return True
+    try:
+        with wave.open(audio_file, "rb") as wf:
+            return (wf.getframerate(), wf.getnchannels(), wf.getsampwidth()) != (rate, CHANNELS, 2)
+    except (wave.Error, EOFError):
+        return True  # e.g. float or compressed WAV
+
+def convert_to_wav(input_file, output_file, rate=RATE):
+    # ffmpeg decodes and resamples in one streaming pass
+    try:
+        subprocess.run(
+            [
+                "ffmpeg", "-y", "-loglevel", "error", "-i", input_file,
+                "-ar", str(rate), "-ac", str(CHANNELS), "-c:a", "pcm_s16le",
+                output_file,
+            ],
+            check=True,
+            capture_output=True,
+        )
+    except FileNotFoundError:
+        audio = AudioSegment.from_file(input_file)
+        audio = audio.set_frame_rate(rate).set_channels(CHANNELS).set_sample_width(2)
+        audio.export(output_file, format="wav")
 
 def get_sentiment_color(sentiment):
     return {
@@ -238,42 +970,240 @@ def display_rich_output(transcript, summary, sentiment, intent, topics):
         console.print(panel)
 
 class Shallowgram:
-    def __init__(self, whisperfile_path=None, vault_path=None):
+    def __init__(
+        self,
+        whisperfile_path=None,
+        vault_path=None,
+        use_server=True,
+        sample_rate=RATE,
+        vad="energy",
+        workers=None,
+        structured_analysis=False,
+        use_cache=True,
+        cache_size=CACHE_MAX_BYTES,
+        threads=None,
+        context_window=None,
+    ):
         self.whisperfile_path = whisperfile_path or os.path.expanduser("~/.whisperfiles")
-        self.vault_path = vault_path or os.path.expanduser("~/Documents/ObsidianVault")
-        self.ai_service = AIService()
+        self.vault_path = vault_path or DEFAULT_VAULT_PATH
+        self.ai_service = AIService(context_window=context_window or CONTEXT_WINDOW)
+        self.use_server = use_server
+        self.sample_rate = sample_rate
+        self.vad = vad  # VAD backend, or None to transcribe silence too
+        self.structured_analysis = structured_analysis
+        self.cache = TranscriptCache(max_bytes=cache_size) if use_cache else None
+        self.workers = workers or default_workers()
+        # Split the cores between parallel workers; one worker keeps whisper's default
+        if threads is None and self.workers > 1:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self.threads = threads
+        self.servers = {}  # (model name, worker slot) -> WhisperServer
+
+    def _transcribe_file(self, audio_file, model, slot=0):
+        """Transcribe through a long-lived server, falling back to a one-shot run
+        A server failure only costs this request its server: the server is
+        stopped and the next request starts a fresh one."""
+        if self.use_server:
+            server = self.servers.get((model, slot))
+            if server is None:
+                model_path = get_whisper_model_path(model, self.whisperfile_path, False)
+                server = self.servers[model, slot] = WhisperServer(
+                    model_path, threads=self.threads
+                )
+            try:
+                return server.transcribe(audio_file)
+            except (RuntimeError, URLError, OSError, ValueError) as e:
+                console.print(f"[yellow]Whisper server unavailable ({e}), running one-shot[/yellow]")
+                server.stop()
+        return transcribe_audio(model, self.whisperfile_path, audio_file, False, self.threads)
+
+    def _transcribe_wav(self, audio_file, model, pauses=None):
+        """Transcribe a 16-bit mono WAV, in chunks if it's long enough
+        Chunks run in parallel with several workers, and one after the other
+        otherwise, so no single request has to outlast SERVER_REQUEST_TIMEOUT.
+        `pauses` are sample positions where the audio may be cut; without them
+        they're found with the energy VAD."""
+        with wave.open(audio_file, "rb") as wf:
+            rate, total = wf.getframerate(), wf.getnframes()
+        if total < PARALLEL_MIN_DURATION * rate:
+            return self._transcribe_file(audio_file, model)
+
+        if pauses is None:
+            pauses = pause_points(detect_speech(audio_file)[0])
+        chunks = plan_chunks(total, rate, pauses)
+        # Download the model once, before the workers all look for it
+        get_whisper_model_path(model, self.whisperfile_path, False)
+
+        slots = queue.Queue()
+        for slot in range(min(self.workers, len(chunks))):
+            slots.put(slot)
+
+        def work(path):
+            slot = slots.get()
+            try:
+                return self._transcribe_file(path, model, slot)
+            finally:
+                slots.put(slot)
+
+        paths = []
+        results = {}
+        try:
+            for start, end, _ in chunks:
+                fd, path = tempfile.mkstemp(suffix=".wav", prefix="shallowgram-part-")
+                os.close(fd)
+                paths.append(path)
+                write_regions(audio_file, path, [(start, end)])
+            with console.status(f"Transcribing {len(chunks)} chunks...") as status:
+                with ThreadPoolExecutor(slots.qsize()) as pool:
+                    futures = {pool.submit(work, path): i for i, path in enumerate(paths)}
+                    for future in as_completed(futures):
+                        results[futures[future]] = future.result()
+                        status.update(f"Transcribed {len(results)}/{len(chunks)} chunks...")
+        finally:
+            for path in paths:
+                os.remove(path)
+
+        segments = []
+        for i, (start, _, lead) in enumerate(chunks):
+            merge_segments(segments, parse_transcript(results[i]), start / rate, lead / rate)
+        return format_transcript(segments)
+
+    def _transcribe_speech(self, audio_file, model):
+        """Transcribe only the speech in a 16-bit mono WAV
+        Leading and trailing silence is trimmed and long pauses are shortened
+        before whisper sees the audio; timestamps refer to the original file."""
+        if not self.vad:
+            return self._transcribe_wav(audio_file, model)
+        regions, rate, total = detect_speech(audio_file, self.vad)
+        silence = total - sum(end - start for start, end in regions)
+        if not regions or silence < VAD_MIN_SAVING * rate:
+            # Nothing detected is more likely a VAD miss than a silent file
+            return self._transcribe_wav(audio_file, model, pause_points(regions))
+
+        fd, speech_file = tempfile.mkstemp(suffix=".wav", prefix="shallowgram-speech-")
+        os.close(fd)
+        try:
+            write_regions(audio_file, speech_file, regions)
+            # In the compressed audio the pauses are where the regions were joined
+            joins = np.cumsum([end - start for start, end in regions])[:-1].tolist()
+            transcript = self._transcribe_wav(speech_file, model, joins)
+        finally:
+            os.remove(speech_file)
+        return format_transcript(TimeMap(regions, rate).remap(parse_transcript(transcript)))
+
+    def close(self):
+        """Stop any whisper servers this client started"""
+        for server in self.servers.values():
+            server.stop()
+        self.servers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def analyze(self, transcript):
+        """Summary, sentiment, intent and topics of a transcript
+        Either one structured request, or four independent ones in parallel.
+        Long transcripts are condensed first, so all of them see the same
+        text and the chunk summaries are only requested once."""
+        text = transcript_text(transcript)
+        key = None
+        if self.cache:
+            key = cache_key(
+                "analysis",
+                self.ai_service.service_type,
+                self.ai_service.model,
+                str(self.structured_analysis),
+                text,
+            )
+            cached = self.cache.get(key)
+            if cached:
+                return json.loads(cached)
+
+        analysis = self._analyze(condense(text, self.ai_service, self.cache))
+        if self.cache:
+            self.cache.put("analysis", key, json.dumps(analysis))
+        return analysis
+
+    def _analyze(self, text):
+        if self.structured_analysis:
+            analysis = analyze_structured(text, self.ai_service)
+            if analysis:
+                return analysis
+            console.print("[yellow]Couldn't parse the combined analysis, asking separately[/yellow]")
+
+        analyses = {
+            'summary': summarize,
+            'sentiment': analyze_sentiment,
+            'intent': detect_intent,
+            'topics': detect_topics,
+        }
+        with ThreadPoolExecutor(len(analyses)) as pool:
+            futures = {
+                key: pool.submit(analyze, text, self.ai_service)
+                for key, analyze in analyses.items()
+            }
+            return {key: future.result() for key, future in futures.items()}
+
+    def record_and_transcribe(self, output_file, model=DEFAULT_WHISPER_MODEL, full_analysis=False):
+        """Record until Enter, transcribing chunk by chunk while recording"""
+
+        def show(segments):
+            for _, _, text in segments:
+                console.print(f"[dim]{text}[/dim]")
+
+        streamer = StreamingTranscriber(
+            lambda path: self._transcribe_speech(path, model), self.sample_rate, show
+        )
+        record_audio(output_file, rate=self.sample_rate, on_audio=streamer.feed)
+        console.print("[cyan]Finishing transcription...[/cyan]")
+        transcript = streamer.finish()
+        if streamer.failed:
+            # A gap in the transcript is worse than the wait
+            console.print("[yellow]Retranscribing the whole recording...[/yellow]")
+            return self.transcribe(output_file, model, full_analysis)
+
+        if full_analysis:
+            return {'text': transcript, **self.analyze(transcript)}
+        return {'text': transcript}
 
     def transcribe(self, audio_file, model=DEFAULT_WHISPER_MODEL, full_analysis=False):
         if not os.path.exists(audio_file):
             raise FileNotFoundError(f"Audio file not found: {audio_file}")
 
-        # Convert to wav if needed
-        file_ext = os.path.splitext(audio_file)[1].lower()
-        if file_ext != ".wav":
-            wav_file = "temp_audio.wav"
-            convert_to_wav(audio_file, wav_file)
+        # The same audio with the same settings always gives the same transcript
+        key = None
+        transcript = None
+        if self.cache:
+            key = cache_key(
+                "transcript", file_hash(audio_file), model, str(self.vad), str(self.sample_rate)
+            )
+            transcript = self.cache.get(key)
+
+        if transcript is None:
+            transcript = self._transcribe_audio(audio_file, model)
+            if self.cache:
+                self.cache.put("transcript", key, transcript)
+
+        if full_analysis:
+            return {'text': transcript, **self.analyze(transcript)}
+
+        return {'text': transcript}
+
+    def _transcribe_audio(self, audio_file, model):
+        # Convert to 16-bit mono WAV at the model's sample rate if needed
+        wav_file = None
+        if needs_conversion(audio_file, self.sample_rate):
+            fd, wav_file = tempfile.mkstemp(suffix=".wav", prefix="shallowgram-")
+            os.close(fd)
+            convert_to_wav(audio_file, wav_file, self.sample_rate)
             audio_file = wav_file
 
         try:
-            transcript = transcribe_audio(model, self.whisperfile_path, audio_file, False)
-
-            if full_analysis:
-                summary = summarize(transcript)
-                sentiment = analyze_sentiment(transcript)
-                intent = detect_intent(transcript)
-                topics = detect_topics(transcript)
-                
-                return {
-                    'text': transcript,
-                    'summary': summary,
-                    'sentiment': sentiment,
-                    'intent': intent,
-                    'topics': topics
-                }
-            
-            return {'text': transcript}
-
+            return self._transcribe_speech(audio_file, model)
         finally:
             # Cleanup temporary file
-            if file_ext != ".wav" and os.path.exists("temp_audio.wav"):
-                os.remove("temp_audio.wav")
\ No newline at end of file
+            if wav_file and os.path.exists(wav_file):
+                os.remove(wav_file)
\ No newline at end of file
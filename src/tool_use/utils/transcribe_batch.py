@@ -0,0 +1,366 @@
+"""Batch transcription for `ai transcribe --batch <dir|glob>`.
+
+Discovered audio files are queued in a SQLite job table keyed by absolute
+path. Workers claim pending jobs, transcribe them and record the outcome,
+so an interrupted batch picks up where it left off and files that are
+already done are skipped unless they changed since (size or mtime). A
+batch keeps refreshing the jobs it's running, so another batch over the
+same files can tell them from jobs a crashed batch left behind. Each
+worker owns its own Shallowgram client, and with it its own whisper
+server, and the machine's cores are divided between them.
+"""
+
+import datetime
+import glob
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from rich.console import Console
+from rich.progress import (
+    BarColumn,
+    MofNCompleteColumn,
+    Progress,
+    TextColumn,
+    TimeElapsedColumn,
+)
+
+DEFAULT_JOBS_PATH = Path.home() / ".tool-use" / "shallowgram" / "batch.db"
+AUDIO_EXTENSIONS = {
+    ".wav", ".mp3", ".m4a", ".flac", ".ogg", ".opus", ".webm", ".mp4", ".aac", ".wma",
+}  # fmt: skip
+HEARTBEAT_INTERVAL = 30  # seconds between refreshes of a batch's running jobs
+STALE_AFTER = 3 * HEARTBEAT_INTERVAL  # running jobs not refreshed for this long are orphaned
+
+JOBS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        path TEXT PRIMARY KEY,
+        status TEXT NOT NULL DEFAULT 'pending',
+        size INTEGER NOT NULL,
+        mtime REAL NOT NULL,
+        duration REAL,
+        output TEXT,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        owner INTEGER,
+        updated REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)",
+]
+
+console = Console()
+
+
+def discover(target: str) -> List[Path]:
+    """Audio files in a directory (recursively) or matching a glob"""
+    path = Path(target).expanduser()
+    if path.is_dir():
+        candidates = path.rglob("*")
+    else:
+        candidates = (Path(match) for match in glob.glob(str(path), recursive=True))
+    return sorted(
+        candidate.resolve()
+        for candidate in candidates
+        if candidate.is_file() and candidate.suffix.lower() in AUDIO_EXTENSIONS
+    )
+
+
+def audio_duration(path: Path) -> Optional[float]:
+    """Length in seconds, from the WAV header or ffprobe"""
+    try:
+        with wave.open(str(path), "rb") as wf:
+            return wf.getnframes() / wf.getframerate()
+    except (wave.Error, EOFError, OSError):
+        pass
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe", "-v", "error", "-show_entries", "format=duration",
+                "-of", "default=noprint_wrappers=1:nokey=1", str(path),
+            ],
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )  # fmt: skip
+        return float(result.stdout.strip())
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+
+def render_output(path: Path, result: Dict[str, str]) -> str:
+    """Transcript as plain text, or as Markdown when it comes with an analysis"""
+    if "summary" not in result:
+        return result["text"]
+    return (
+        f"# {path.stem}\n\n"
+        f"Source: {path}\n\n"
+        f"## Summary\n\n{result['summary']}\n\n"
+        f"- **Sentiment:** {result['sentiment']}\n"
+        f"- **Intent:** {result['intent']}\n"
+        f"- **Topics:** {result['topics']}\n\n"
+        f"## Transcript\n\n{result['text']}"
+    )
+
+
+class JobQueue:
+    """The batch job table; one connection per call, so threads can share it"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else DEFAULT_JOBS_PATH
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in JOBS_SCHEMA:
+                conn.execute(statement)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "owner" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def enqueue(self, files: List[Path]) -> List[Tuple[str, Optional[float], Optional[str]]]:
+        """Queue files that aren't done yet and return the pending jobs
+        Failed jobs are retried, and so are running ones whose batch stopped
+        refreshing them; jobs another live batch is running are left to it.
+        Done jobs are queued again if their file changed or their
+        output is gone. Each job comes with the output it last wrote, which
+        the batch may overwrite."""
+        paths = [str(file) for file in files]
+        placeholders = ",".join("?" * len(paths))
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    f"""
+                    UPDATE jobs SET status = 'pending', owner = NULL
+                    WHERE path IN ({placeholders})
+                        AND (status = 'failed' OR (status = 'running' AND updated < ?))
+                """,
+                    (*paths, now - STALE_AFTER),
+                )
+                conn.executemany(
+                    """
+                    INSERT INTO jobs (path, size, mtime, updated) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(path) DO UPDATE SET
+                        status = 'pending', size = excluded.size, mtime = excluded.mtime,
+                        duration = NULL, updated = excluded.updated
+                    WHERE status != 'running'
+                        AND (size != excluded.size OR mtime != excluded.mtime)
+                """,
+                    [
+                        (str(file), stat.st_size, stat.st_mtime, now)
+                        for file, stat in ((file, file.stat()) for file in files)
+                    ],
+                )
+                done = conn.execute(
+                    f"SELECT path, output FROM jobs WHERE status = 'done' AND path IN ({placeholders})",
+                    paths,
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE jobs SET status = 'pending' WHERE path = ?",
+                    [(path,) for path, output in done if not output or not os.path.exists(output)],
+                )
+            return conn.execute(
+                f"""
+                SELECT path, duration, output FROM jobs
+                WHERE status = 'pending' AND path IN ({placeholders})
+                ORDER BY path
+            """,
+                paths,
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def _update(self, path: str, **columns) -> None:
+        columns["updated"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    f"UPDATE jobs SET {assignments} WHERE path = ?",
+                    (*columns.values(), path),
+                )
+        finally:
+            conn.close()
+
+    def start(self, path: str, duration: Optional[float]) -> bool:
+        """Claim a pending job for this process; False if another batch got it first"""
+        conn = self._connect()
+        try:
+            with conn:
+                claimed = conn.execute(
+                    """
+                    UPDATE jobs SET status = 'running', duration = ?, owner = ?,
+                        attempts = attempts + 1, updated = ?
+                    WHERE path = ? AND status = 'pending'
+                """,
+                    (duration, os.getpid(), time.time(), path),
+                ).rowcount
+        finally:
+            conn.close()
+        return claimed == 1
+
+    def heartbeat(self) -> None:
+        """Mark this process's running jobs as still alive"""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "UPDATE jobs SET updated = ? WHERE status = 'running' AND owner = ?",
+                    (time.time(), os.getpid()),
+                )
+        finally:
+            conn.close()
+
+    def finish(self, path: str, output: str) -> None:
+        self._update(path, status="done", output=output, error=None, owner=None)
+
+    def fail(self, path: str, error: str) -> None:
+        self._update(path, status="failed", error=error, owner=None)
+
+    def counts(self, files: List[Path]) -> Dict[str, int]:
+        placeholders = ",".join("?" * len(files))
+        conn = self._connect()
+        try:
+            return dict(
+                conn.execute(
+                    f"SELECT status, COUNT(*) FROM jobs WHERE path IN ({placeholders}) GROUP BY status",
+                    [str(file) for file in files],
+                ).fetchall()
+            )
+        finally:
+            conn.close()
+
+
+def run_batch(
+    target: str,
+    make_client: Callable[[Optional[int]], object],
+    workers: int,
+    full_analysis: bool = False,
+    vault_path: Optional[str] = None,
+    jobs_path: Optional[Path] = None,
+) -> Dict[str, int]:
+    """Transcribe every audio file under `target` not transcribed yet
+    `make_client(threads)` builds a Shallowgram for one worker. Outputs are
+    written next to each file as `<name>.<ext>.txt` (or `.md`), or into
+    `vault_path` when given, mirroring the folders below the batch root.
+    Existing files the batch didn't write are never overwritten; their jobs
+    fail instead. Returns the job counts by status for the files of this
+    batch."""
+    files = discover(target)
+    if not files:
+        console.print(f"[yellow]No audio files found in {target}[/yellow]")
+        return {}
+    root = Path(os.path.commonpath([file.parent for file in files]))
+
+    queue = JobQueue(jobs_path)
+    pending = queue.enqueue(files)
+    skipped = len(files) - len(pending)
+    if skipped:
+        console.print(f"[dim]Skipping {skipped} already transcribed file(s)[/dim]")
+    if not pending:
+        return queue.counts(files)
+
+    workers = max(1, min(workers, len(pending)))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    local = threading.local()
+    clients = []
+    clients_lock = threading.Lock()
+    stats_lock = threading.Lock()
+    audio_done = 0.0
+    started = time.monotonic()
+
+    def client():
+        if not hasattr(local, "client"):
+            local.client = make_client(threads)
+            with clients_lock:
+                clients.append(local.client)
+        return local.client
+
+    def write(path: Path, result: Dict[str, str], previous: Optional[str]) -> str:
+        # Keep the audio extension so talk.wav and talk.mp3 don't share an output
+        if vault_path:
+            folder = Path(vault_path).expanduser() / path.relative_to(root).parent
+            output = folder / f"{path.name}.md"
+            output.parent.mkdir(parents=True, exist_ok=True)
+        else:
+            output = path.with_name(f"{path.name}.{'md' if full_analysis else 'txt'}")
+        try:
+            with open(output, "w" if str(output) == previous else "x") as f:
+                f.write(render_output(path, result))
+        except FileExistsError:
+            raise FileExistsError(f"{output} exists and wasn't written by this batch") from None
+        return str(output)
+
+    with Progress(
+        TextColumn("[cyan]{task.description}"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        TextColumn("{task.fields[speed]}"),
+        TimeElapsedColumn(),
+        console=console,
+    ) as progress:
+        task = progress.add_task("Transcribing", total=len(pending), speed="")
+
+        def process(job: Tuple[str, Optional[float], Optional[str]]) -> None:
+            nonlocal audio_done
+            path = Path(job[0])
+            duration = job[1] or audio_duration(path)
+            if not queue.start(str(path), duration):
+                progress.update(task, advance=1)
+                return
+            try:
+                result = client().transcribe(str(path), full_analysis=full_analysis)
+                queue.finish(str(path), write(path, result, job[2]))
+            except Exception as e:
+                queue.fail(str(path), str(e))
+                progress.console.print(f"[red]{path.name}: {e}[/red]")
+                duration = 0.0
+            with stats_lock:
+                audio_done += duration or 0.0
+                speed = audio_done / max(time.monotonic() - started, 1e-6)
+            progress.update(
+                task,
+                advance=1,
+                speed=f"{datetime.timedelta(seconds=round(audio_done))} audio, {speed:.1f}x",
+            )
+
+        stop = threading.Event()
+
+        def heartbeat() -> None:
+            while not stop.wait(HEARTBEAT_INTERVAL):
+                queue.heartbeat()
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+        try:
+            with ThreadPoolExecutor(workers) as pool:
+                list(pool.map(process, pending))
+        finally:
+            stop.set()
+            for worker_client in clients:
+                worker_client.close()
+
+    counts = queue.counts(files)
+    elapsed = time.monotonic() - started
+    console.print(
+        f"[green]{counts.get('done', 0)} done[/green], "
+        f"[red]{counts.get('failed', 0)} failed[/red] - "
+        f"{audio_done / 60:.1f} min of audio in {elapsed / 60:.1f} min "
+        f"({audio_done / max(elapsed, 1e-6):.1f} audio seconds per second)"
+    )
+    return counts
@@ -0,0 +1,110 @@
+"""On-disk cache for shallowgram's transcripts and analysis results.
+
+Entries are keyed by a SHA-256 of everything that determines them (the
+audio content or input text, the prompt and the model), so identical
+material is never processed twice: re-running `ai transcribe` on the same
+file, or analyzing a transcript that shares passages with an earlier one,
+only pays for what's new. When the cache grows past its size limit the
+least recently used entries are evicted.
+"""
+
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_CACHE_PATH = Path.home() / ".tool-use" / "shallowgram" / "cache.db"
+CACHE_MAX_BYTES = 500 * 1024 * 1024
+EVICT_TO = 0.9  # evict down to this fraction of the limit, not just under it
+HASH_BLOCK_SIZE = 1024 * 1024
+
+CACHE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS entries (
+        key TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        value TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        used REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_entries_used ON entries(used)",
+]
+
+
+def cache_key(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file's content, read a block at a time"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """SQLite-backed LRU cache, safe to share between threads"""
+
+    def __init__(self, path: Optional[Path] = None, max_bytes: int = CACHE_MAX_BYTES):
+        self.path = Path(path) if path else DEFAULT_CACHE_PATH
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in CACHE_SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key: str) -> Optional[str]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row:
+                with conn:
+                    conn.execute(
+                        "UPDATE entries SET used = ? WHERE key = ?", (time.time(), key)
+                    )
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def put(self, kind: str, key: str, value: str) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO entries (key, kind, value, size, used)
+                    VALUES (?, ?, ?, ?, ?)
+                """,
+                    (key, kind, value, len(value.encode("utf-8")), time.time()),
+                )
+                self._evict(conn)
+        finally:
+            conn.close()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if total <= self.max_bytes:
+            return
+        evict = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY used"):
+            if total <= self.max_bytes * EVICT_TO:
+                break
+            evict.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", evict)
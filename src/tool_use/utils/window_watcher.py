@@ -0,0 +1,352 @@
+"""Automatic activity tracking from the focused window, for `ai log watch`.
+
+The focused window's application and title are sampled at a fixed interval.
+Consecutive identical samples are coalesced into one span in memory and
+closed spans are appended to the database in periodic batches. Window titles
+are interned once in `window_titles`, so a span row is three integers.
+Categorization runs on distinct titles, a batch at a time, never per sample;
+titles the categorizer keeps failing on are retried behind fresh ones and
+eventually filed as Uncategorized.
+"""
+
+import datetime
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .idle_monitor import IDLE_THRESHOLD, IdleProbe
+
+Window = Tuple[str, str]  # (application, window title)
+WindowProbe = Callable[[], Optional[Window]]
+Categorizer = Callable[[List[str]], Dict[str, str]]
+
+SAMPLE_INTERVAL = 15  # seconds between samples
+FLUSH_INTERVAL = 5 * 60  # seconds between batched writes
+CATEGORIZE_INTERVAL = 15 * 60  # seconds between categorization batches
+CATEGORIZE_BATCH_SIZE = 40
+MAX_CATEGORIZE_ATTEMPTS = 3  # then the title is filed as Uncategorized
+MAX_TITLE_LENGTH = 200
+PROBE_TIMEOUT = 2
+
+WATCH_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS window_titles (
+        id INTEGER PRIMARY KEY,
+        app TEXT NOT NULL,
+        title TEXT NOT NULL,
+        category TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (app, title)
+    )
+    """,
+    # Append-only; start is unix seconds, duration is seconds
+    """
+    CREATE TABLE IF NOT EXISTS window_spans (
+        start INTEGER NOT NULL,
+        duration INTEGER NOT NULL,
+        title_id INTEGER NOT NULL REFERENCES window_titles(id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_window_spans_start ON window_spans(start)",
+    """
+    CREATE INDEX IF NOT EXISTS idx_window_titles_pending
+    ON window_titles(attempts, id) WHERE category IS NULL
+    """,
+]
+
+
+def ensure_schema(db_path: Path) -> None:
+    conn = sqlite3.connect(db_path)
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(window_titles)")}
+        if columns and "attempts" not in columns:
+            conn.execute(
+                "ALTER TABLE window_titles ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0"
+            )
+            conn.execute("DROP INDEX IF EXISTS idx_window_titles_uncategorized")
+        for statement in WATCH_SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _run(command: list) -> Optional[str]:
+    try:
+        result = subprocess.run(
+            command, capture_output=True, text=True, timeout=PROBE_TIMEOUT
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+
+def x11_probe() -> Optional[Window]:
+    """Focused X11 window via xdotool; the process name comes from /proc"""
+    output = _run(["xdotool", "getactivewindow", "getwindowpid", "getwindowname"])
+    if not output:
+        return None
+    pid, _, title = output.partition("\n")
+    try:
+        app = Path(f"/proc/{pid.strip()}/comm").read_text().strip()
+    except OSError:
+        app = "unknown"
+    return app, title.strip()
+
+
+_MACOS_SCRIPT = """
+tell application "System Events"
+    set frontApp to first application process whose frontmost is true
+    set appName to name of frontApp
+    set windowTitle to ""
+    try
+        set windowTitle to name of front window of frontApp
+    end try
+end tell
+return appName & tab & windowTitle
+"""
+
+
+def macos_probe() -> Optional[Window]:
+    """Frontmost macOS application and window via System Events"""
+    output = _run(["osascript", "-e", _MACOS_SCRIPT])
+    if not output:
+        return None
+    app, _, title = output.strip().partition("\t")
+    return app, title
+
+
+class FileProbe:
+    """Reads the focused window from a file as 'app<TAB>title', for tests and
+    custom hooks. A missing or empty file means no window (e.g. screen locked)."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path).expanduser()
+
+    def __call__(self) -> Optional[Window]:
+        try:
+            text = self.path.read_text().strip()
+        except OSError:
+            return None
+        if not text:
+            return None
+        app, _, title = text.partition("\t")
+        return app, title
+
+
+def get_probe(spec: str = "auto") -> Optional[WindowProbe]:
+    """Resolve a probe name ('auto', 'x11', 'macos' or 'file:<path>')"""
+    if spec.startswith("file:"):
+        return FileProbe(Path(spec[len("file:"):]))
+    probes = {"x11": x11_probe, "macos": macos_probe}
+    if spec != "auto":
+        if spec not in probes:
+            raise ValueError(
+                f"Unknown window probe '{spec}'. Use auto, {', '.join(probes)} or file:<path>"
+            )
+        return probes[spec]
+    if sys.platform == "darwin":
+        return macos_probe
+    if os.environ.get("DISPLAY") and shutil.which("xdotool"):
+        return x11_probe
+    return None
+
+
+class WindowWatcher:
+    """Samples the focused window and records coalesced spans"""
+
+    def __init__(
+        self,
+        db_path: Path,
+        probe: WindowProbe,
+        categorize: Optional[Categorizer] = None,
+        interval: float = SAMPLE_INTERVAL,
+        idle_probe: Optional[IdleProbe] = None,
+        idle_threshold: float = IDLE_THRESHOLD,
+    ):
+        self.db_path = db_path
+        self.probe = probe
+        self.categorize = categorize
+        self.interval = interval
+        self.idle_probe = idle_probe
+        self.idle_threshold = idle_threshold
+
+        self.current: Optional[Window] = None
+        self.current_start = 0.0
+        self.last_seen = 0.0
+        self.pending: List[Tuple[str, str, int, int]] = []
+        ensure_schema(db_path)
+
+    def _observe(self) -> Optional[Window]:
+        if self.idle_probe:
+            idle = self.idle_probe()
+            if idle is not None and idle >= self.idle_threshold:
+                return None  # away from the keyboard, nothing is being worked on
+        window = self.probe()
+        if window is None:
+            return None
+        app, title = window
+        return app[:MAX_TITLE_LENGTH], title[:MAX_TITLE_LENGTH]
+
+    def _close_span(self, end: float) -> None:
+        if self.current is not None:
+            duration = int(round(end - self.current_start))
+            if duration > 0:
+                self.pending.append(
+                    (*self.current, int(self.current_start), duration)
+                )
+        self.current = None
+
+    def sample(self, now: Optional[float] = None) -> None:
+        """Take one sample, extending the current span or starting a new one"""
+        now = time.time() if now is None else now
+        window = self._observe()
+        if window == self.current and self.current is not None:
+            self.last_seen = now
+            return
+
+        # A switch happened at some point since the previous sample. Switching
+        # windows is taken to happen now; going away is estimated halfway
+        # between the last sample that saw the window and this one.
+        self._close_span(
+            now if window is not None else min(self.last_seen + self.interval / 2, now)
+        )
+        if window is not None:
+            self.current = window
+            self.current_start = now
+            self.last_seen = now
+
+    def flush(self) -> int:
+        """Append closed spans in one transaction; return how many were written"""
+        if not self.pending:
+            return 0
+        spans, self.pending = self.pending, []
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO window_titles (app, title) VALUES (?, ?)",
+                    {(app, title) for app, title, _, _ in spans},
+                )
+                conn.executemany(
+                    """
+                    INSERT INTO window_spans (start, duration, title_id)
+                    SELECT ?, ?, id FROM window_titles WHERE app = ? AND title = ?
+                """,
+                    [(start, duration, app, title) for app, title, start, duration in spans],
+                )
+        finally:
+            conn.close()
+        return len(spans)
+
+    def categorize_pending(self, batch_size: int = CATEGORIZE_BATCH_SIZE) -> int:
+        """Categorize one batch of not yet categorized window titles
+        Titles tried least often go first. Every title the categorizer fails
+        on, or leaves out of its answer, counts an attempt, and after
+        MAX_CATEGORIZE_ATTEMPTS it is filed as Uncategorized so it can't
+        hold up the queue. Returns how many titles were categorized."""
+        if not self.categorize:
+            return 0
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute(
+                """
+                SELECT id, app, title FROM window_titles WHERE category IS NULL
+                ORDER BY attempts, id LIMIT ?
+            """,
+                (batch_size,),
+            ).fetchall()
+            if not rows:
+                return 0
+            labels = {f"{app}: {title}" if title else app: id for id, app, title in rows}
+            try:
+                assignments = {
+                    label: category
+                    for label, category in self.categorize(list(labels)).items()
+                    if label in labels
+                }
+            except Exception:
+                assignments = {}  # every title in the batch counts a failed attempt
+            with conn:
+                conn.executemany(
+                    "UPDATE window_titles SET category = ? WHERE id = ?",
+                    [(category, labels[label]) for label, category in assignments.items()],
+                )
+                conn.executemany(
+                    """
+                    UPDATE window_titles SET attempts = attempts + 1,
+                        category = CASE WHEN attempts + 1 >= ? THEN 'Uncategorized' END
+                    WHERE id = ?
+                """,
+                    [
+                        (MAX_CATEGORIZE_ATTEMPTS, id)
+                        for label, id in labels.items()
+                        if label not in assignments
+                    ],
+                )
+            return len(assignments)
+        finally:
+            conn.close()
+
+    def run(
+        self,
+        stop_event: Optional[threading.Event] = None,
+        flush_interval: float = FLUSH_INTERVAL,
+        categorize_interval: float = CATEGORIZE_INTERVAL,
+    ) -> None:
+        """Sample until stop_event is set (or forever), then write what's left"""
+        stop_event = stop_event or threading.Event()
+        next_flush = time.monotonic() + flush_interval
+        next_categorize = time.monotonic() + categorize_interval
+        try:
+            while not stop_event.is_set():
+                self.sample()
+                now = time.monotonic()
+                if now >= next_flush:
+                    self.flush()
+                    next_flush = now + flush_interval
+                if now >= next_categorize:
+                    self.categorize_pending()
+                    next_categorize = time.monotonic() + categorize_interval
+                stop_event.wait(self.interval)
+        finally:
+            self._close_span(time.time())
+            self.flush()
+
+
+def summarize(
+    db_path: Path, since: datetime.datetime, limit: int = 10
+) -> Tuple[List[Tuple[str, float]], List[Tuple[str, str, str, float]]]:
+    """Watched time since `since`: (per category, top windows)"""
+    ensure_schema(db_path)
+    start = int(since.timestamp())
+    conn = sqlite3.connect(db_path)
+    try:
+        categories = conn.execute(
+            """
+            SELECT COALESCE(t.category, 'Uncategorized'), SUM(s.duration) AS total
+            FROM window_spans s JOIN window_titles t ON t.id = s.title_id
+            WHERE s.start >= ?
+            GROUP BY 1 ORDER BY total DESC
+        """,
+            (start,),
+        ).fetchall()
+        windows = conn.execute(
+            """
+            SELECT t.app, t.title, COALESCE(t.category, 'Uncategorized'),
+                   SUM(s.duration) AS total
+            FROM window_spans s JOIN window_titles t ON t.id = s.title_id
+            WHERE s.start >= ?
+            GROUP BY s.title_id ORDER BY total DESC LIMIT ?
+        """,
+            (start, limit),
+        ).fetchall()
+    finally:
+        conn.close()
+    return categories, windows